@@ -0,0 +1,140 @@
+"""
+analyzeJWT de punta a punta: el árbol actual contra una revisión de referencia.
+
+Para cada tamaño de payload (--claims) genera tokens válidos y planos con el
+corpus sintético y mide el tiempo medio por token de analyzeJWT con la caché de
+veredictos desactivada (--no-header-cache desactiva también la de headers).
+Con --baseline REV, los mismos tokens se miden además en esa revisión,
+extraída con `git worktree` en un directorio temporal. Cada árbol corre en su
+propio proceso, alternando los dos árboles durante --rounds rondas; de cada
+uno se toma la mejor de todas sus corridas (--repeat por ronda) para reducir el ruido.
+
+Uso, desde backend/:
+    python -m benchmarks.bench_analyze --baseline 2c124fa
+    python -m benchmarks.bench_analyze --claims 2 8 64 --size 500 --repeat 7
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(tokens_by_claims, repeat):
+    """µs por token de analyzeJWT (mejor de `repeat` corridas) en el árbol importable."""
+    from controllers.analyzeController import analyzeJWT
+
+    results = {}
+    for claims, tokens in tokens_by_claims.items():
+        for token in tokens[:10]:
+            analyzeJWT(token)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for token in tokens:
+                analyzeJWT(token)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[claims] = round(best * 1e6 / len(tokens), 2)
+    return results
+
+
+def _env(header_cache):
+    env = dict(os.environ, VERDICT_CACHE_SIZE="0")
+    if not header_cache:
+        env["HEADER_CACHE_SIZE"] = "0"
+    return env
+
+
+def measure_in(backend_dir, tokens_by_claims, repeat, header_cache):
+    """measure() en otro proceso, con `backend_dir` como raíz de importación."""
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"tokens": tokens_by_claims, "repeat": repeat}, f)
+    try:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", f.name],
+            cwd=backend_dir, env=_env(header_cache), check=True, capture_output=True, text=True,
+        ).stdout
+    finally:
+        os.unlink(f.name)
+    return json.loads(out)
+
+
+def worktree(rev):
+    """Extrae `rev` en un directorio temporal; retorna (ruta de backend/, función para borrarlo)."""
+    path = tempfile.mkdtemp(prefix="bench-")
+    subprocess.run(["git", "worktree", "add", "--detach", path, rev],
+                   cwd=BACKEND, check=True, capture_output=True)
+
+    def remove():
+        subprocess.run(["git", "worktree", "remove", "--force", path], cwd=BACKEND, capture_output=True)
+
+    return os.path.join(path, "backend"), remove
+
+
+def run(claims, size, seed, repeat, baseline=None, header_cache=True, rounds=3):
+    from .corpus import generate
+
+    now = int(time.time())
+    tokens_by_claims = {
+        str(n): [item["token"] for item in generate(size, seed, (n,), max_depth=0, invalid_ratio=0, now=now)]
+        for n in claims
+    }
+
+    trees = {"head": BACKEND}
+    remove = None
+    if baseline:
+        trees["baseline"], remove = worktree(baseline)
+
+    results = {}
+    try:
+        for _ in range(rounds):
+            for name, backend_dir in trees.items():
+                timings = measure_in(backend_dir, tokens_by_claims, repeat, header_cache)
+                best = results.setdefault(name, timings)
+                for n, us in timings.items():
+                    best[n] = min(best[n], us)
+    finally:
+        if remove is not None:
+            remove()
+
+    if baseline:
+        results["speedup"] = {
+            n: round(results["baseline"][n] / results["head"][n], 2) for n in tokens_by_claims
+        }
+
+    return {
+        "meta": {"claims": list(claims), "size": size, "seed": seed, "repeat": repeat, "rounds": rounds,
+                 "baseline": baseline, "header_cache": header_cache, "unit": "us_per_token"},
+        "results": results,
+    }
+
+
+def _worker(path):
+    sys.path.insert(0, os.getcwd())
+    with open(path) as f:
+        job = json.load(f)
+    print(json.dumps(measure(job["tokens"], job["repeat"])))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        _worker(sys.argv[2])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, nargs="+", default=[2, 8, 64])
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--baseline", help="revisión de git contra la que comparar (p. ej. 2c124fa)")
+    parser.add_argument("--no-header-cache", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.claims, args.size, args.seed, args.repeat,
+                         args.baseline, not args.no_header_cache, args.rounds), indent=2))
@@ -0,0 +1,155 @@
+"""
+Compara el LexerDecoded actual (escáner de una pasada, con listas y con
+spans=True) con la implementación anterior (verify_alphabet + cadena de if por carácter).
+
+Uso, desde backend/:
+    python -m benchmarks.bench_lexer [--repeat N]
+"""
+import argparse
+import json
+import timeit
+
+from lexer.tokens import TokenType
+from lexer.lexerDecode import LexerDecoded
+
+
+class LegacyLexerDecoded:
+    """Implementación anterior, conservada solo como referencia de comparación."""
+
+    ALPHABET = LexerDecoded.ALPHABET
+
+    def __init__(self, json_text: str):
+        self.json = json_text
+        self.tokens = []
+        self.i = 0
+
+    def verify_alphabet(self):
+        for ch in self.json:
+            if ch not in self.ALPHABET:
+                raise ValueError(f"Error léxico (decodificado): carácter '{ch}' fuera de Σ₂")
+
+    def tokenize(self):
+        text = self.json
+        length = len(text)
+
+        while self.i < length:
+            ch = text[self.i]
+
+            if ch.isspace():
+                self.i += 1
+                continue
+
+            if ch == '{':
+                self.tokens.append((TokenType.L_BRACE, ch))
+                self.i += 1
+                continue
+
+            if ch == '}':
+                self.tokens.append((TokenType.R_BRACE, ch))
+                self.i += 1
+                continue
+
+            if ch == ',':
+                self.tokens.append((TokenType.COMMA, ch))
+                self.i += 1
+                continue
+
+            if ch == ':':
+                self.tokens.append((TokenType.COLON, ch))
+                self.i += 1
+                continue
+
+            if ch == '"':
+                self.i += 1
+                start = self.i
+
+                while self.i < length and text[self.i] != '"':
+                    if not (text[self.i].isalnum() or text[self.i] == " "):
+                        raise ValueError(
+                            "STRING inválido: solo letras, números y espacios permitidos según el AFD"
+                        )
+                    self.i += 1
+
+                value = text[start:self.i]
+                self.tokens.append((TokenType.STRING, value))
+                self.i += 1
+                continue
+
+            if text.startswith("true", self.i):
+                self.tokens.append((TokenType.BOOLEAN, "true"))
+                self.i += 4
+                continue
+
+            if text.startswith("false", self.i):
+                self.tokens.append((TokenType.BOOLEAN, "false"))
+                self.i += 5
+                continue
+
+            if ch.isalnum():
+                start = self.i
+                while self.i < length and text[self.i].isalnum():
+                    self.i += 1
+                value = text[start:self.i]
+                self.tokens.append((TokenType.STRING, value))
+                continue
+
+            raise ValueError(
+                f"Caracter inesperado: '{ch}' en posición {self.i}"
+            )
+
+        return self.tokens
+
+    def analyze(self):
+        self.verify_alphabet()
+        return self.tokenize()
+
+
+def make_payload(claims: int) -> str:
+    body = {"sub": "1234567890", "name": "John Doe", "admin": True, "iat": 1516239022}
+    for n in range(claims):
+        body[f"claim{n}"] = f"valor numero {n}" if n % 2 else n
+    return json.dumps(body, separators=(",", ":"))
+
+
+CASES = {
+    "header": '{"alg":"HS256","typ":"JWT"}',
+    "payload-small": make_payload(0),
+    "payload-1k-claims": make_payload(1000),
+    "payload-50k-claims": make_payload(50000),
+}
+
+
+def run(cls, text, **kwargs):
+    try:
+        return cls(text, **kwargs).analyze()
+    except ValueError as e:
+        return str(e)
+
+
+def bench(repeat: int):
+    report = {}
+    for name, text in CASES.items():
+        if not run(LegacyLexerDecoded, text) == run(LexerDecoded, text) == run(LexerDecoded, text, spans=True):
+            raise AssertionError(f"Los lexers producen resultados distintos para {name}")
+
+        number = max(1, 200000 // len(text))
+        legacy = min(timeit.repeat(lambda: run(LegacyLexerDecoded, text), number=number, repeat=repeat)) / number
+        current = min(timeit.repeat(lambda: run(LexerDecoded, text), number=number, repeat=repeat)) / number
+        spans = min(timeit.repeat(lambda: run(LexerDecoded, text, spans=True), number=number, repeat=repeat)) / number
+
+        report[name] = {
+            "chars": len(text),
+            "legacy_us": round(legacy * 1e6, 2),
+            "current_us": round(current * 1e6, 2),
+            "speedup": round(legacy / current, 2),
+            "spans_us": round(spans * 1e6, 2),
+            "spans_speedup": round(legacy / spans, 2),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.repeat), indent=2))
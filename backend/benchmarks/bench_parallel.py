@@ -0,0 +1,78 @@
+"""
+Escalamiento del análisis por lotes con el pool de procesos (utils.parallel).
+
+Mide _analyze_many (sin caché de veredictos) y test_encode_list sobre un corpus
+sintético, primero en el proceso actual y luego con pools de 1 a N procesos.
+Cada pool se calienta antes de medir, para no contar el arranque de los procesos.
+
+Uso, desde backend/:
+    python -m benchmarks.bench_parallel --size 4000 --max-workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from controllers.analyzeController import _analyze_tokens, _analysis_failed
+from controllers.encodeController import _test_encode_cases, _test_encode_failed
+from utils.parallel import PARALLEL_CHUNK_SIZE, map_chunks
+
+from .corpus import generate
+
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+
+def run(size, seed, claims, max_workers, chunk_size, repeat):
+    corpus = generate(size, seed, claims)
+    tokens = [item["token"] for item in corpus]
+    cases = [{"header": i["header"], "payload": i["payload"], "secret": i["secret"]} for i in corpus]
+
+    workloads = {
+        "analyze": lambda executor: map_chunks(_analyze_tokens, tokens, _analysis_failed, executor, chunk_size),
+        "test_encode": lambda executor: map_chunks(_test_encode_cases, cases, _test_encode_failed, executor, chunk_size),
+    }
+
+    results = {name: {} for name in workloads}
+    for name, work in workloads.items():
+        results[name]["in-process"] = {"seconds": round(_best(lambda: work(None), repeat), 4)}
+
+    context = multiprocessing.get_context("spawn")
+    for workers in range(1, max_workers + 1):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            for name, work in workloads.items():
+                work(executor)
+                seconds = _best(lambda: work(executor), repeat)
+                baseline = results[name]["in-process"]["seconds"]
+                results[name][f"{workers}-workers"] = {
+                    "seconds": round(seconds, 4),
+                    "speedup": round(baseline / seconds, 2),
+                }
+
+    return {
+        "meta": {"size": size, "seed": seed, "claims": list(claims), "chunk_size": chunk_size,
+                 "repeat": repeat, "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--claims", type=int, nargs="+", default=[2, 8, 64])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=PARALLEL_CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.size, args.seed, tuple(args.claims), args.max_workers, args.chunk_size, args.repeat), indent=2))
@@ -0,0 +1,205 @@
+"""
+Micro-benchmarks por fase del analizador y del codificador sobre un corpus sintético.
+
+Cada fase se mide por separado, alimentada solo con las entradas que llegan a
+ella en el pipeline real; además se miden analyzeJWT (con la caché de veredictos
+desactivada) y encode_jwt completos. El resultado es JSON para poder comparar
+corridas; con --compare se marca como regresión toda fase cuyo tiempo medio por
+elemento crezca más que --threshold, y el proceso termina con código 1.
+
+Uso, desde backend/:
+    python -m benchmarks.bench_phases --size 2000 --output bench.json
+    python -m benchmarks.bench_phases --compare bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from lexer.lexerEncode import EncodedLexer
+from lexer.lexerDecode import LexerDecoded
+from sintactic.parser import SyntaxAnalyzer
+from semantic.semantic import SemanticAnalyzer
+from utils.decode import JWTDecoder
+from utils.encode import JWTEncoder
+from utils.signer import sign_token
+from controllers.analyzeController import analyzeJWT
+from controllers.encodeController import encode_jwt
+from pipeline.cache import verdict_cache
+
+from .corpus import generate
+
+
+def _try(fn, *args):
+    try:
+        return fn(*args)
+    except Exception:
+        return None
+
+
+def build_stages(corpus):
+    """Prepara, para cada fase, la lista de (función, argumentos) que recibe en el pipeline."""
+    stages = {name: [] for name in (
+        "encoded-lexer", "decode", "lexer-header", "lexer-payload", "syntax",
+        "json-parser", "semantic", "encoder", "signer", "analyzeJWT", "encode_jwt",
+    )}
+
+    for item in corpus:
+        token = item["token"]
+        stages["analyzeJWT"].append((analyzeJWT, (token,)))
+        stages["encoded-lexer"].append((lambda t: EncodedLexer(t).tokenize(), (token,)))
+
+        header, payload = item["header"], item["payload"]
+        stages["encoder"].append((lambda h, p: JWTEncoder(h, p).encode(), (header, payload)))
+        if header["alg"] in ("HS256", "HS384"):
+            unsigned = JWTEncoder(header, payload).encode()
+            stages["signer"].append((sign_token, (header["alg"], item["secret"], unsigned)))
+            data = {"header": header, "payload": payload, "secret": item["secret"]}
+            stages["encode_jwt"].append((encode_jwt, (data,)))
+
+        encoded = _try(lambda: EncodedLexer(token).tokenize())
+        if encoded is None:
+            continue
+        stages["decode"].append((lambda t: JWTDecoder(t).decode(), (token,)))
+
+        decoded = _try(lambda: JWTDecoder(token).decode())
+        if decoded is None:
+            continue
+        header_json, payload_json = decoded["header_json"], decoded["payload_json"]
+        stages["lexer-header"].append((lambda j: LexerDecoded(j).analyze(), (header_json,)))
+        stages["lexer-payload"].append((lambda j: LexerDecoded(j).analyze(), (payload_json,)))
+
+        header_tokens = _try(lambda: LexerDecoded(header_json).analyze())
+        payload_tokens = _try(lambda: LexerDecoded(payload_json).analyze())
+        if header_tokens is None or payload_tokens is None:
+            continue
+        stages["syntax"].append((
+            lambda e, h, p: SyntaxAnalyzer(e, h, p).analyze(),
+            (encoded, header_tokens, payload_tokens),
+        ))
+
+        if _try(lambda: SyntaxAnalyzer(encoded, header_tokens, payload_tokens).analyze()) is None:
+            continue
+        stages["json-parser"].append((lambda h, p: (json.loads(h), json.loads(p)), (header_json, payload_json)))
+
+        objects = _try(lambda: (json.loads(header_json), json.loads(payload_json)))
+        if objects is None:
+            continue
+        stages["semantic"].append((
+            lambda h, p, s: SemanticAnalyzer(h, p, s).analyze(),
+            (objects[0], objects[1], decoded["signature_b64"]),
+        ))
+
+    return stages
+
+
+def time_stage(calls, repeat: int):
+    """Mínimo por elemento sobre `repeat` pasadas, en nanosegundos."""
+    best = [None] * len(calls)
+    clock = time.perf_counter_ns
+
+    for _ in range(repeat):
+        for i, (fn, args) in enumerate(calls):
+            start = clock()
+            try:
+                fn(*args)
+            except Exception:
+                pass
+            elapsed = clock() - start
+            if best[i] is None or elapsed < best[i]:
+                best[i] = elapsed
+
+    return best
+
+
+def summarize(samples):
+    if not samples:
+        return {"items": 0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "items": n,
+        "total_ms": round(sum(ordered) / 1e6, 3),
+        "mean_us": round(sum(ordered) / n / 1e3, 3),
+        "p50_us": round(ordered[n // 2] / 1e3, 3),
+        "p95_us": round(ordered[min(n - 1, int(n * 0.95))] / 1e3, 3),
+        "max_us": round(ordered[-1] / 1e3, 3),
+    }
+
+
+def run(size, seed, claims, max_depth, invalid_ratio, repeat):
+    corpus = generate(size, seed, claims, max_depth, invalid_ratio)
+    stages = build_stages(corpus)
+
+    # analyzeJWT se mide sin caché: interesa el costo de las fases, no los aciertos
+    cache_size = verdict_cache.maxsize
+    verdict_cache.maxsize = 0
+    try:
+        results = {name: summarize(time_stage(calls, repeat)) for name, calls in stages.items()}
+    finally:
+        verdict_cache.maxsize = cache_size
+
+    return {
+        "meta": {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": {
+                "size": size,
+                "seed": seed,
+                "claims": list(claims),
+                "max_depth": max_depth,
+                "invalid_ratio": invalid_ratio,
+            },
+            "repeat": repeat,
+        },
+        "stages": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Fases cuyo mean_us creció más que `threshold` (fracción) respecto a la línea base."""
+    regressions = {}
+    for name, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or not old.get("mean_us") or not stats.get("mean_us"):
+            continue
+        change = stats["mean_us"] / old["mean_us"] - 1
+        if change > threshold:
+            regressions[name] = {
+                "baseline_mean_us": old["mean_us"],
+                "mean_us": stats["mean_us"],
+                "change": round(change, 3),
+            }
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--claims", type=int, nargs="+", default=[2, 8, 64])
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--invalid-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="archivo JSON donde guardar el resultado")
+    parser.add_argument("--compare", help="resultado JSON previo contra el cual comparar")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    report = run(args.size, args.seed, tuple(args.claims), args.max_depth, args.invalid_ratio, args.repeat)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
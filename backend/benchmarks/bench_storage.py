@@ -0,0 +1,90 @@
+"""
+Operaciones del almacenamiento (database.storage) sobre un corpus sintético.
+
+Mide save_analysis uno por uno, save_analyses por lotes, el recorrido completo
+de find_page e iter_analyses y analyze_repository_incremental. Con el backend
+SQLite (por defecto) usa un archivo temporal nuevo en cada corrida, así los
+números se pueden reproducir sin un servidor de MongoDB; con --backend mongo
+usa MONGO_URI y vacía las colecciones de análisis antes de empezar.
+
+Uso, desde backend/:
+    python -m benchmarks.bench_storage --size 5000 --batch 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from .corpus import generate
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(backend, size, seed, claims, batch):
+    if backend == "sqlite":
+        os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+    os.environ["STORAGE_BACKEND"] = backend
+    os.environ.setdefault("INCREMENTAL_LAG_MS", "0")
+
+    # Después de fijar el entorno: los módulos leen la configuración al importarse
+    from controllers.analyzeController import analyze_repository_incremental, analysis_record, analyzeJWT
+    from database.storage import get_storage
+
+    storage = get_storage()
+    storage.connect()
+    storage.ensure_indexes()
+    storage.clear_analyses()
+
+    tokens = [item["token"] for item in generate(size, seed, claims)]
+    records = [(token, analysis_record(analyzeJWT(token, compact=True))) for token in tokens]
+    single = records[:min(len(records), 1000)]
+
+    results = {}
+    seconds = _timed(lambda: [storage.save_analysis(token, record) for token, record in single])
+    results["save_analysis"] = {"docs": len(single), "us_per_doc": round(seconds * 1e6 / len(single), 2)}
+
+    seconds = _timed(lambda: [storage.save_analyses(records[i:i + batch]) for i in range(0, len(records), batch)])
+    results["save_analyses"] = {"docs": len(records), "batch": batch, "us_per_doc": round(seconds * 1e6 / len(records), 2)}
+
+    def walk_pages():
+        cursor, pages = None, 0
+        while True:
+            _, cursor = storage.find_page("analyses", projection={"token": 1, "token_hash": 1}, cursor=cursor)
+            pages += 1
+            if cursor is None:
+                return pages
+
+    total = len(single) + len(records)
+    seconds = _timed(walk_pages)
+    results["find_page"] = {"docs": total, "ms": round(seconds * 1000, 3)}
+
+    seconds = _timed(lambda: sum(1 for _ in storage.iter_analyses({}, batch, {"token": 1})))
+    results["iter_analyses"] = {"docs": total, "ms": round(seconds * 1000, 3)}
+
+    seconds = _timed(analyze_repository_incremental)
+    results["incremental_first"] = {"ms": round(seconds * 1000, 3)}
+    seconds = _timed(analyze_repository_incremental)
+    results["incremental_noop"] = {"ms": round(seconds * 1000, 3)}
+
+    storage.shutdown()
+    return {
+        "meta": {"backend": backend, "size": size, "seed": seed, "claims": list(claims), "batch": batch},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "mongo"], default="sqlite")
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--claims", type=int, nargs="+", default=[2, 8, 64])
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.backend, args.size, args.seed, tuple(args.claims), args.batch), indent=2))
@@ -0,0 +1,141 @@
+"""
+Generador reproducible de corpus de JWT para los benchmarks.
+
+Cada elemento es un dict con: token, header, payload, secret, valid (bool) y
+kind (la mutación aplicada a los inválidos, o "valid").
+"""
+import base64
+import json
+import random
+import time
+
+from utils.encode import JWTEncoder
+from utils.signer import sign_token
+
+WORDS = ["alice", "bob", "admin", "user", "service", "api", "reader", "writer", "John Doe", "ACME 42"]
+
+INVALID_KINDS = [
+    "missing-dot",
+    "bad-segment",
+    "bad-base64",
+    "bad-char",
+    "bad-string",
+    "bad-typ",
+    "bad-alg",
+    "expired",
+    "not-yet-valid",
+    "json-error",
+]
+
+
+def _b64(data: str) -> str:
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode().rstrip("=")
+
+
+def _tampered(payload: dict, extra: str) -> str:
+    """Payload serializado con un claim extra escrito a mano (para romper Σ₂ o el JSON)."""
+    text = json.dumps(payload, separators=(",", ":"))
+    return _b64(text[:-1] + "," + extra + "}")
+
+
+def _value(rnd: random.Random, depth: int):
+    if depth > 0 and rnd.random() < 0.3:
+        return _object(rnd, rnd.randint(1, 4), depth - 1)
+    choice = rnd.random()
+    if choice < 0.45:
+        return rnd.choice(WORDS) + str(rnd.randint(0, 999))
+    if choice < 0.85:
+        return rnd.randint(0, 10 ** 9)
+    return rnd.random() < 0.5
+
+
+def _object(rnd: random.Random, claims: int, depth: int):
+    return {f"c{n}": _value(rnd, depth) for n in range(claims)}
+
+
+def make_item(rnd: random.Random, claims: int, depth: int, valid: bool, now: int):
+    alg = rnd.choice(["HS256", "HS384"])
+    header = {"alg": alg, "typ": "JWT"}
+    payload = {
+        "sub": rnd.choice(WORDS),
+        "iat": now - 60,
+        "exp": now + 3600 * 24 * 365,
+    }
+    payload.update(_object(rnd, claims, depth))
+    secret = f"secret{rnd.randint(0, 9)}"
+
+    kind = "valid" if valid else rnd.choice(INVALID_KINDS)
+    if kind == "bad-typ":
+        header["typ"] = "JWS"
+    elif kind == "bad-alg":
+        header["alg"] = "none"
+    elif kind == "expired":
+        payload["exp"] = now - 3600
+        payload["iat"] = now - 7200
+    elif kind == "not-yet-valid":
+        payload["nbf"] = now + 3600
+        payload["iat"] = now + 3600
+
+    unsigned = JWTEncoder(header, payload).encode()
+    token = f"{unsigned}.{sign_token(alg if alg != 'none' else 'HS256', secret, unsigned)}"
+    h, p, s = token.split(".")
+
+    if kind == "missing-dot":
+        token = f"{h}{p}.{s}"
+    elif kind == "bad-segment":
+        token = f"{h}.{p}*.{s}"
+    elif kind == "bad-base64":
+        # Una longitud ≡ 1 (mod 4) nunca es Base64 válido
+        token = f"{h}.{p + 'A' * ((1 - len(p)) % 4)}.{s}"
+    elif kind == "bad-char":
+        token = ".".join([h, _tampered(payload, '"x":1.5'), s])
+    elif kind == "bad-string":
+        token = ".".join([h, _tampered(payload, '"x":"a-b"'), s])
+    elif kind == "json-error":
+        token = ".".join([h, _tampered(payload, '"x":abc'), s])
+
+    return {
+        "token": token,
+        "header": header,
+        "payload": payload,
+        "secret": secret,
+        "valid": valid,
+        "kind": kind,
+    }
+
+
+def generate(size: int = 1000, seed: int = 42, claims=(2, 8, 64), max_depth: int = 2,
+             invalid_ratio: float = 0.3, now: int = None):
+    """
+    Genera `size` elementos con una semilla fija. `claims` son los tamaños de
+    payload (número de claims extra) entre los que se elige uniformemente,
+    `max_depth` la profundidad máxima de objetos anidados y `invalid_ratio`
+    la fracción de tokens inválidos.
+    """
+    rnd = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    return [
+        make_item(
+            rnd,
+            claims=rnd.choice(claims),
+            depth=rnd.randint(0, max_depth),
+            valid=rnd.random() >= invalid_ratio,
+            now=now,
+        )
+        for _ in range(size)
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera un corpus de JWT en JSON.")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--claims", type=int, nargs="+", default=[2, 8, 64])
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--invalid-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    corpus = generate(args.size, args.seed, tuple(args.claims), args.max_depth, args.invalid_ratio)
+    print(json.dumps(corpus, ensure_ascii=False))
@@ -1,194 +1,233 @@
 import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
+from lexer.tokens import TokenStream
+from pipeline.engine import ANALYZER_VERSION, TOKEN_SPANS, JWTPipeline, PipelineError
+from pipeline.cache import verdict_cache, verdict_deadline
+from pipeline.bulk import BULK_MIN_TOKENS, available as bulk_available, bulk_decode
+from database.storage import get_storage
 from utils.decode import JWTDecoder
-from lexer.lexerEncode import EncodedLexer
-from lexer.lexerDecode import LexerDecoded
-from sintactic.parser import SyntaxAnalyzer
-from semantic.semantic import SemanticAnalyzer
-from database.db import DatabaseConnector
+from utils.hashing import token_hash
+from utils.parallel import map_chunks
 
-def analyzeJWT_summary(token):
-    """Versión simplificada que solo retorna status, phase y message sin detalles."""
-    try:
-        lex = EncodedLexer(token)
-        encodedToken = lex.tokenize()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "lexico-codificado",
-            "message": str(e)
-        }
-    
-    try:
-        decoded = JWTDecoder(token)
-        decodedToken = decoded.decode()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "decode",
-            "message": str(e)
-        }
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+# Bloques en espera en el pool de lotes, sumando todas las peticiones
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "32"))
 
-    header_json = decodedToken["header_json"]
-    payload_json = decodedToken["payload_json"]
-    signature = decodedToken["signature_b64"]
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="analyze-batch")
+# Un lugar por bloque enviado al pool; se libera cuando el bloque termina
+_batch_slots = threading.BoundedSemaphore(BATCH_WORKERS + BATCH_QUEUE_SIZE)
 
-    try:
-        header_tokens = LexerDecoded(header_json).analyze()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "lexico-header",
-            "message": str(e)
-        }
-    
-    try:
-        payload_tokens = LexerDecoded(payload_json).analyze()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "lexico-payload",
-            "message": str(e)
-        }
+# Análisis incremental: solo se toman documentos con al menos este margen de
+# antigüedad, para no saltarse los que la escritura diferida aún no ha insertado
+INCREMENTAL_LAG_MS = int(os.getenv("INCREMENTAL_LAG_MS", "5000"))
+INCREMENTAL_STATE = "analyze_all"
 
-    try:
-        parser = SyntaxAnalyzer(
-            encoded_tokens=encodedToken,
-            header_tokens=header_tokens,
-            payload_tokens=payload_tokens
-        )
-        parser.analyze()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "sintactico",
-            "message": str(e)
-        }
+_incremental_lock = threading.Lock()
+
+def _analyze_cached(token):
+    """
+    Ejecuta el pipeline completo o devuelve el veredicto en caché. Un acierto
+    evita el análisis léxico, sintáctico y semántico por completo. El prefiltro
+    va antes que la caché para no calcular el hash de un token descartado.
+    """
+    rejected = _prefilter(token)
+    if rejected is not None:
+        return rejected
+    cached = verdict_cache.get(token)
+    if cached is not None:
+        return cached
+    return _run_pipeline(token)
 
+def _prefilter(token):
+    """Error del prefiltro (pipeline.prefilter) o None si el token puede analizarse."""
     try:
-        header_dict = json.loads(header_json)
-        payload_dict = json.loads(payload_json)
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "json-parser",
-            "message": str(e)
-        }
+        JWTPipeline(token).prefilter()
+    except PipelineError as e:
+        return e.to_dict()
+    return None
+
+def _run_pipeline(token, decoded=None):
+    """Analiza el token y guarda el veredicto; `decoded` viene de bulk_decode si ya se hizo."""
+    result, payload = _execute(token, decoded)
+    verdict_cache.put(token, result, payload)
+    return result
 
+def _execute(token, decoded=None):
+    """
+    Ejecuta el pipeline sin tocar la caché, para un token que ya pasó _prefilter.
+    Retorna el resultado y el payload (para la caché).
+    """
+    pipeline = JWTPipeline(token)
     try:
-        sem = SemanticAnalyzer(header_dict, payload_dict, signature)
-        sem.analyze()
-    except Exception as e:
-        return {
-            "status": "error",
-            "phase": "semantic",
-            "message": str(e)
+        if decoded is None:
+            pipeline.run(prefilter=False)
+        else:
+            pipeline.run_decoded(*decoded)
+        result = {
+            "status": "ok",
+            "header": pipeline.header,
+            "payload": pipeline.payload,
+            "signature": pipeline.signature,
+            "tokens": {
+                "encoded": pipeline.encoded_tokens,
+                "header": pipeline.header_tokens,
+                "payload": pipeline.payload_tokens
+            }
         }
+    except PipelineError as e:
+        result = e.to_dict()
 
+    return result, pipeline.payload
+
+def _analyze_tokens(tokens):
+    """
+    Bloque de trabajo de map_chunks: analiza los tokens (con el front end por
+    lotes si son suficientes) y retorna [(resultado, payload)]. Puede correr en
+    otro proceso, así que no usa la caché; el llamador guarda los veredictos.
+    """
+    if len(tokens) < BULK_MIN_TOKENS or not bulk_available():
+        decoded = [None] * len(tokens)
+    else:
+        decoded = bulk_decode(tokens, TOKEN_SPANS)
+    return [_execute(token, pre) for token, pre in zip(tokens, decoded)]
+
+def _analysis_failed(token, message):
+    """Resultado para un token cuyo análisis lanzó una excepción inesperada (no se guarda en caché)."""
     return {
-        "status": "ok",
-        "message": "Token válido"
+        "status": "error",
+        "phase": "analyze_list",
+        "message": message
     }
 
-def analyzeJWT(token):
+def _analyze_many(tokens):
+    """
+    Como _analyze_cached para una lista de tokens. Los que faltan en la caché se
+    analizan por bloques con map_chunks (en el pool de procesos si está activo).
+    En cada bloque, la verificación de Σ₁ y la decodificación Base64URL se hacen
+    en conjunto (pipeline.bulk); los que no pasan siguen el camino por token y
+    obtienen el mismo error de siempre. Un token cuyo análisis falla de forma
+    inesperada recibe un error propio sin afectar a los demás. Los que rechaza
+    el prefiltro no llegan a la caché ni al pipeline.
+    """
+    results = [_prefilter(token) for token in tokens]
+    for i, token in enumerate(tokens):
+        if results[i] is None:
+            results[i] = verdict_cache.get(token)
+
+    # Un token repetido dentro de la lista se analiza una sola vez
+    missing = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(tokens[i], []).append(i)
+    if not missing:
+        return results
 
-    try:
-        lex =EncodedLexer(token)
-        encodedToken = lex.tokenize()
-    except Exception as e:
+    pending = list(missing)
+    for token, output in zip(pending, map_chunks(_analyze_tokens, pending, _analysis_failed)):
+        if isinstance(output, dict):
+            result = output
+        else:
+            result, payload = output
+            verdict_cache.put(token, result, payload)
+        for i in missing[token]:
+            results[i] = result
+    return results
+
+def _group_by_hash(tokens):
+    """
+    Agrupa los tokens por su hash. Retorna {hash: token} con los tokens distintos
+    en orden de primera aparición, el hash de cada ocurrencia y cuántas veces
+    aparece cada hash.
+    """
+    hashes = [token_hash(token) for token in tokens]
+    distinct = {}
+    for key, token in zip(hashes, tokens):
+        distinct.setdefault(key, token)
+    return distinct, hashes, Counter(hashes)
+
+def _fan_out(hashes, counts, verdicts):
+    """Un resultado por ocurrencia, copiado del veredicto de su token, con el número de ocurrencias."""
+    results = []
+    for key in hashes:
+        result = dict(verdicts[key])
+        result["occurrences"] = counts[key]
+        results.append(result)
+    return results
+
+def _summary(result):
+    if result["status"] != "ok":
         return {
-            "status": "error",
-            "phase": "lexico-codificado",
-            "message": str(e)
-        }
-    
-    try:
-        decoded = JWTDecoder(token)
-        decodedToken = decoded.decode()
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "decode",
-            "message": str(e)
+            "status": result["status"],
+            "phase": result["phase"],
+            "message": result["message"]
         }
 
-    header_json = decodedToken["header_json"]
-    payload_json = decodedToken["payload_json"]
-    signature = decodedToken["signature_b64"]
+    return {
+        "status": "ok",
+        "message": "Token válido"
+    }
 
+def analyzeJWT_summary(token):
+    """Versión simplificada que solo retorna status, phase y message sin detalles."""
+    return _summary(_analyze_cached(token))
 
-    try:
-        header_tokens = LexerDecoded(header_json).analyze()
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "lexico-header",
-            "message": str(e)
-        }
-    
-    try:
-        payload_tokens = LexerDecoded(payload_json).analyze()
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "lexico-payload",
-            "message": str(e)
-        }
-    
+def _tokens_as_lists(result):
+    """
+    Convierte los TokenStream del resultado (con TOKEN_SPANS=1) a listas de
+    tuplas. FastAPI no sabe serializar un TokenStream, así que todo resultado que
+    sale por una ruta normal pasa por aquí; las rutas que usan to_json no lo necesitan.
+    """
+    tokens = result.get("tokens")
+    if tokens is not None and any(isinstance(stream, TokenStream) for stream in tokens.values()):
+        result["tokens"] = {name: list(stream) for name, stream in tokens.items()}
+    return result
 
-    try:
-        parser = SyntaxAnalyzer(
-            encoded_tokens=encodedToken,
-            header_tokens=header_tokens,
-            payload_tokens=payload_tokens
-        )
-        parser.analyze()
-        
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "sintactico",
-            "message": str(e)
-        }
+def verify_result(token, result, verifier):
+    """
+    Aplica la fase de verificación de firma a un resultado ok (puede venir de la
+    caché, que no depende de la clave). Retorna una copia con `verified` y `kid`,
+    o el error de la fase "verification".
+    """
+    if result["status"] != "ok":
+        return result
 
+    pipeline = JWTPipeline(token)
+    pipeline.header = result["header"]
+    pipeline.signature = result["signature"]
     try:
-        header_dict = json.loads(header_json)
-        payload_dict = json.loads(payload_json)
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "json-parser",
-            "message": str(e)
-        }
-    
+        pipeline.verify_signature(verifier)
+    except PipelineError as e:
+        return e.to_dict()
 
-    try:
-        sem = SemanticAnalyzer(header_dict, payload_dict, signature)
-        sem.analyze()
-    except Exception as e:
-        return{
-            "status": "error",
-            "phase": "semantic",
-            "message": str(e)
-        }
-    
+    result = dict(result)
+    result["verified"] = True
+    result["kid"] = pipeline.kid
+    return result
 
-    return {
-        "status": "ok",
-        "header": header_dict,
-        "payload": payload_dict,
-        "signature": signature,
-        "tokens": {
-            "encoded": encodedToken,
-            "header": header_tokens,
-            "payload": payload_tokens
-        }
-    }
-def analyze_list(tokens):
+def analyzeJWT(token, compact=False, verifier=None):
+    """Con `verifier` (utils.verify.SignatureVerifier) también se verifica la firma."""
+    result = _analyze_cached(token)
+    if verifier is not None:
+        result = verify_result(token, result, verifier)
+    # Copia superficial: los llamadores agregan campos (p. ej. "token") al resultado
+    result = dict(result)
+    return result if compact else _tokens_as_lists(result)
+def analyze_list(tokens, compact=False):
     results = []
     try:
-        for token in tokens:
-            result = analyzeJWT(token)
+        tokens = list(tokens)
+        for token, cached in zip(tokens, _analyze_many(tokens)):
+            # Copia superficial, como en analyzeJWT
+            result = dict(cached)
+            if not compact:
+                _tokens_as_lists(result)
             # Agregar el token al resultado para poder mostrarlo en la tabla
             result["token"] = token
             results.append(result)
@@ -199,14 +238,81 @@ def analyze_list(tokens):
             "message": str(e)
         })
     return results
-def analyze_repository():
+def analysis_record(result):
+    """Campos del resultado que se guardan en la colección `analyses` (sin los tokens léxicos)."""
+    record = {
+        "status": result.get("status"),
+        "phase": result.get("phase"),
+        "message": result.get("message"),
+        "header": result.get("header"),
+        "payload": result.get("payload"),
+        "signature": result.get("signature"),
+    }
+    return {k: v for k, v in record.items() if v is not None}
+
+def _analyze_chunk(chunk, save):
+    """
+    Un resultado por token del bloque. Si el insert_many falla, cada uno lo
+    indica con "saved": false y "save_error", sin agregar líneas al lote.
+    """
+    results = analyze_list(chunk, compact=True)
+    if save:
+        try:
+            get_storage().save_analyses([(r["token"], analysis_record(r)) for r in results])
+        except Exception as e:
+            message = f"No se pudo guardar el análisis: {e}"
+            for result in results:
+                result["saved"] = False
+                result["save_error"] = message
+    return results
+
+def _submit_chunk(chunk, save):
+    # Espera lugar en vez de encolar sin límite: la petición ya fue admitida
+    # por cpu_executor, así que aquí solo se regula el ritmo
+    _batch_slots.acquire()
+    try:
+        future = _batch_pool.submit(_analyze_chunk, chunk, save)
+    except Exception:
+        _batch_slots.release()
+        raise
+    future.add_done_callback(lambda _: _batch_slots.release())
+    return future
+
+def analyze_batch(tokens, chunk_size=BATCH_CHUNK_SIZE, save=True):
+    """
+    Analiza una secuencia de tokens por bloques en el pool de trabajo y produce
+    los resultados en el mismo orden de entrada a medida que se completan.
+    Cada bloque se guarda con un solo insert_many. Como máximo hay dos bloques
+    por worker en vuelo, así un cliente lento no acumula resultados en memoria,
+    y entre todas las peticiones no más de BATCH_WORKERS + BATCH_QUEUE_SIZE.
+    """
+    pending = deque()
+    window = BATCH_WORKERS * 2
+    chunk = []
+
+    for token in tokens:
+        chunk.append(token)
+        if len(chunk) >= chunk_size:
+            pending.append(_submit_chunk(chunk, save))
+            chunk = []
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+
+    if chunk:
+        pending.append(_submit_chunk(chunk, save))
+
+    while pending:
+        yield from pending.popleft().result()
+
+def analyze_repository(compact=False):
     """
     Recupera todos los tokens del repositorio (MongoDB) y los analiza en lote.
-    Retorna una lista con los resultados de cada token.
+    Retorna una lista con los resultados de cada token (con `compact`, los
+    tokens léxicos se dejan como los produjo el pipeline, igual que en analyzeJWT).
     """
     try:
         # Recuperar todos los análisis guardados
-        analyses = DatabaseConnector.find_analyses({}, 1000)
+        analyses = get_storage().find_analyses({}, 1000, {"token": 1})
         
         # Extraer los tokens
         tokens = [analysis["token"] for analysis in analyses if "token" in analysis]
@@ -218,12 +324,16 @@ def analyze_repository():
                 "results": []
             }
         
-        # Analizar todos los tokens
-        results = analyze_list(tokens)
+        # Analizar una vez cada token distinto y repartir el veredicto a cada ocurrencia
+        distinct, hashes, counts = _group_by_hash(tokens)
+        verdicts = dict(zip(distinct, analyze_list(distinct.values(), compact=compact)))
+        results = _fan_out(hashes, counts, verdicts)
         
         return {
             "status": "ok",
             "total": len(tokens),
+            "distinct": len(distinct),
+            "duplicates": len(tokens) - len(distinct),
             "results": results
         }
         
@@ -234,10 +344,39 @@ def analyze_repository():
             "message": str(e)
         }
 
+def analyze_repository_stream(batch_size=BATCH_CHUNK_SIZE):
+    """
+    Versión en streaming de analyze_repository: recorre todo el repositorio con
+    un cursor por lotes y produce cada resultado apenas se analiza, sin límite
+    de documentos. La última línea resume el total analizado.
+    """
+    total = 0
+    try:
+        for analysis in get_storage().iter_analyses({}, batch_size, {"token": 1}):
+            token = analysis.get("token")
+            if not token:
+                continue
+            result = analyzeJWT(token, compact=True)
+            result["token"] = token
+            total += 1
+            yield result
+    except Exception as e:
+        yield {
+            "status": "error",
+            "phase": "analyze_repository",
+            "message": str(e)
+        }
+        return
+
+    yield {
+        "status": "ok",
+        "total": total
+    }
+
 def analyze_repository_summary():
     """Analiza todos los tokens del repositorio sin detalles, solo status."""
     try:
-        analyses = DatabaseConnector.find_analyses({}, 1000)
+        analyses = get_storage().find_analyses({}, 1000, {"token": 1})
         tokens = [analysis["token"] for analysis in analyses if "token" in analysis]
         
         if not tokens:
@@ -252,26 +391,24 @@ def analyze_repository_summary():
                 "results": []
             }
         
-        results = []
-        valid_count = 0
-        invalid_count = 0
-        
-        for token in tokens:
-            result = analyzeJWT_summary(token)
-            result["token"] = token
-            results.append(result)
-            
-            if result["status"] == "ok":
-                valid_count += 1
-            else:
-                invalid_count += 1
+        distinct, hashes, counts = _group_by_hash(tokens)
+        verdicts = {}
+        for (key, token), cached in zip(distinct.items(), _analyze_many(list(distinct.values()))):
+            verdict = _summary(cached)
+            verdict["token"] = token
+            verdicts[key] = verdict
+
+        results = _fan_out(hashes, counts, verdicts)
+        valid_count = sum(1 for result in results if result["status"] == "ok")
         
         return {
             "status": "ok",
             "summary": {
                 "total": len(tokens),
                 "valid": valid_count,
-                "invalid": invalid_count
+                "invalid": len(tokens) - valid_count,
+                "distinct": len(distinct),
+                "duplicates": len(tokens) - len(distinct)
             },
             "results": results
         }
@@ -282,4 +419,180 @@ def analyze_repository_summary():
             "phase": "analyze_repository_summary",
             "message": str(e)
         }
-    
\ No newline at end of file
+    
+def _recheck_at(token, result, now):
+    """
+    Momento en que el veredicto podría cambiar por el paso del tiempo (exp/nbf),
+    o None si no depende del reloj. Solo la fase semántica mira el reloj.
+    """
+    if result["status"] == "ok":
+        payload = result.get("payload")
+    elif result.get("phase") == "semantic":
+        payload = json.loads(JWTDecoder(token).decode()["payload_json"])
+    else:
+        return None
+
+    deadline = verdict_deadline(payload, now)
+    return datetime.fromtimestamp(deadline) if deadline is not None else None
+
+def analyze_repository_incremental():
+    """
+    Versión incremental de analyze_repository_summary sobre todo el repositorio.
+    Guarda un veredicto por token distinto (colección `verdicts`) y un watermark
+    de created_at con el resumen acumulado (colección `analysis_state`).
+
+    En cada llamada solo se analizan los documentos posteriores al watermark (y
+    los de su mismo instante que aún no se contaron, según watermark_ids),
+    los veredictos de otra versión del analizador y los que dependen del reloj
+    cuyo recheck_at ya pasó; el resumen se ajusta con las diferencias.
+    """
+    with _incremental_lock:
+        try:
+            now = datetime.now()
+            clock = time.time()
+            cutoff = now - timedelta(milliseconds=INCREMENTAL_LAG_MS)
+
+            state = get_storage().get_analysis_state(INCREMENTAL_STATE) or {}
+            summary = dict(state.get("summary") or {"total": 0, "valid": 0, "invalid": 0, "distinct": 0})
+            watermark = state.get("watermark")
+            # _id de los documentos ya contados cuyo created_at es el watermark
+            # (no existe en el estado de versiones anteriores)
+            counted = state.get("watermark_ids")
+
+            created = {"$lte": cutoff}
+            if watermark is not None:
+                # Con $gte, un documento guardado después con el mismo created_at no se pierde
+                created["$gte" if counted is not None else "$gt"] = watermark
+            counted = set(counted or ())
+
+            new_tokens = {}
+            new_counts = Counter()
+            newest = watermark
+            newest_ids = list(counted)
+            documents = 0
+            fields = {"token": 1, "token_hash": 1, "created_at": 1}
+            for doc in get_storage().iter_analyses({"created_at": created}, BATCH_CHUNK_SIZE, fields):
+                if doc["_id"] in counted:
+                    continue
+                if newest is None or doc["created_at"] > newest:
+                    newest = doc["created_at"]
+                    newest_ids = [doc["_id"]]
+                elif doc["created_at"] == newest:
+                    newest_ids.append(doc["_id"])
+                token = doc.get("token")
+                if not token:
+                    continue
+                # Los documentos anteriores a token_hash no lo tienen guardado
+                key = doc.get("token_hash") or token_hash(token)
+                new_tokens.setdefault(key, token)
+                new_counts[key] += 1
+                documents += 1
+
+            known = get_storage().find_verdicts(list(new_tokens))
+            stale = {doc["_id"]: doc for doc in get_storage().iter_stale_verdicts(ANALYZER_VERSION, now)}
+            known.update(stale)
+
+            pending = {key: token for key, token in new_tokens.items() if key not in known or key in stale}
+            for key, doc in stale.items():
+                pending.setdefault(key, doc["token"])
+
+            updates = []
+            for (key, token), result in zip(pending.items(), _analyze_many(list(pending.values()))):
+                previous = known.get(key)
+                occurrences = new_counts.get(key, 0)
+                if previous is None:
+                    summary["distinct"] += 1
+                else:
+                    summary["valid" if previous["status"] == "ok" else "invalid"] -= previous["occurrences"]
+                    occurrences += previous["occurrences"]
+                summary["valid" if result["status"] == "ok" else "invalid"] += occurrences
+
+                verdict = _summary(result)
+                verdict.update({
+                    "_id": key,
+                    "token": token,
+                    "occurrences": occurrences,
+                    "analyzer_version": ANALYZER_VERSION,
+                    "recheck_at": _recheck_at(token, result, clock),
+                    "updated_at": now,
+                })
+                updates.append(verdict)
+
+            # Tokens ya conocidos con veredicto vigente: solo suman ocurrencias
+            for key, count in new_counts.items():
+                if key in pending:
+                    continue
+                verdict = dict(known[key], occurrences=known[key]["occurrences"] + count, updated_at=now)
+                summary["valid" if verdict["status"] == "ok" else "invalid"] += count
+                updates.append(verdict)
+
+            summary["total"] += documents
+            get_storage().save_verdicts(updates)
+            get_storage().save_analysis_state(INCREMENTAL_STATE, {
+                "watermark": newest,
+                "watermark_ids": newest_ids,
+                "analyzer_version": ANALYZER_VERSION,
+                "summary": summary,
+                "updated_at": now,
+            })
+
+            return {
+                "status": "ok",
+                "summary": {**summary, "duplicates": summary["total"] - summary["distinct"]},
+                "incremental": {
+                    "new_documents": documents,
+                    "analyzed": len(pending),
+                    "rechecked": len(stale),
+                    "watermark": newest,
+                    "analyzer_version": ANALYZER_VERSION,
+                },
+            }
+
+        except Exception as e:
+            return {
+                "status": "error",
+                "phase": "analyze_repository_incremental",
+                "message": str(e)
+            }
+
+def list_analyses(limit, cursor=None, hash_filter=None):
+    """
+    Una página de análisis guardados, más recientes primero, con el cursor de la
+    siguiente. Solo trae token, hash, fecha y el estado del resultado; con
+    `hash_filter` lista las ocurrencias de un token. Un cursor inválido lanza
+    ValueError (la ruta lo revisa antes y responde 400).
+    """
+    projection = {"token": 1, "token_hash": 1, "result.status": 1, "result.phase": 1, "result.message": 1}
+    storage = get_storage()
+    if cursor:
+        storage.check_cursor(cursor)
+    try:
+        docs, next_cursor = storage.find_page(
+            "analyses", {"token_hash": hash_filter} if hash_filter else None, projection, limit, cursor
+        )
+    except Exception as e:
+        return {
+            "status": "error",
+            "phase": "list_analyses",
+            "message": str(e)
+        }
+
+    results = []
+    for doc in docs:
+        result = doc.get("result") or {}
+        results.append({
+            "id": str(doc["_id"]),
+            "token": doc.get("token"),
+            "token_hash": doc.get("token_hash"),
+            "status": result.get("status"),
+            "phase": result.get("phase"),
+            "message": result.get("message"),
+            "created_at": doc.get("created_at")
+        })
+
+    return {
+        "status": "ok",
+        "total": len(results),
+        "results": results,
+        "next_cursor": next_cursor
+    }
@@ -1,30 +1,105 @@
+import os
+
 from utils.encode import JWTEncoder
-from utils.signer import signer_hs256, signer_hs384
-from utils.verify import verify_hs256, verify_hs384
-from database.db import DatabaseConnector
+from utils.signer import keyed_hmac, sign_token, sign_with, sign_with_kid
+from utils.verify import verify_token
+from database.storage import get_storage
+from utils.parallel import map_chunks
+
+ENCODE_BATCH_CHUNK_SIZE = int(os.getenv("ENCODE_BATCH_CHUNK_SIZE", "500"))
 
 def encode_jwt(data):
     header = data["header"]
     payload = data["payload"]
-    secret = data["secret"]
+    # Sin secreto se firma con la clave del `kid` del header en el almacén de claves
+    secret = data.get("secret")
 
     alg = header.get("alg")
     encoder = JWTEncoder(header, payload)
 
     unsigned = encoder.encode()
 
-    if alg == "HS256":
-        sign = signer_hs256(secret)
-    elif alg == "HS384":
-        sign = signer_hs384(secret)
+    if secret is None and "kid" in header:
+        signature = sign_with_kid(alg, header["kid"], unsigned)
     else:
-        raise ValueError("Algoritmo no soportado")
-
-    signature = sign(unsigned)
+        signature = sign_token(alg, secret, unsigned)
     jwt_final = f"{unsigned}.{signature}"
 
     return {"jwt": jwt_final}
 
+def _encode_item(item, signers):
+    """
+    encode_jwt para un elemento de encode_batch. `signers` guarda el HMAC ya
+    inicializado de cada (alg, secreto) durante todo el lote.
+    """
+    if not isinstance(item, dict) or not isinstance(item.get("header"), dict) or not isinstance(item.get("payload"), dict):
+        raise ValueError("Cada elemento debe tener header y payload (objetos JSON)")
+
+    header = item["header"]
+    secret = item.get("secret")
+    alg = header.get("alg")
+    unsigned = JWTEncoder(header, item["payload"]).encode()
+
+    if secret is None and "kid" in header:
+        return f"{unsigned}.{sign_with_kid(alg, header['kid'], unsigned)}"
+    if not isinstance(secret, str):
+        raise ValueError("secret requerido (o un kid del almacén de claves en el header)")
+
+    mac = signers.get((alg, secret))
+    if mac is None:
+        mac = signers[(alg, secret)] = keyed_hmac(alg, secret)
+    return f"{unsigned}.{sign_with(mac, unsigned)}"
+
+def _encode_chunk(chunk, start, signers, save):
+    """
+    Resultados de un bloque; `start` es la posición de su primer elemento en el
+    lote. Si el insert_many falla, cada token generado del bloque lo indica con
+    "saved": false y "save_error".
+    """
+    results = []
+    saved = []
+    for index, item in enumerate(chunk, start):
+        try:
+            result = {"status": "ok", "index": index, "jwt": _encode_item(item, signers)}
+            saved.append((item, result))
+        except Exception as e:
+            result = {
+                "status": "error",
+                "index": index,
+                "phase": "encoding",
+                "message": str(e)
+            }
+        results.append(result)
+
+    if save and saved:
+        try:
+            get_storage().save_encoded_tokens(saved)
+        except Exception as e:
+            message = f"No se pudo guardar el token: {e}"
+            for _, result in saved:
+                result["saved"] = False
+                result["save_error"] = message
+    return results
+
+def encode_batch(items, chunk_size=ENCODE_BATCH_CHUNK_SIZE, save=True):
+    """
+    Genera y firma un JWT por elemento ({header, payload, secret}) y los produce
+    en el mismo orden a medida que avanza, exactamente una línea por elemento y
+    con su posición en `index`. Los generados de cada bloque se guardan con un
+    solo insert_many; un elemento inválido solo afecta su línea.
+    """
+    signers = {}
+    chunk = []
+    start = 0
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _encode_chunk(chunk, start, signers, save)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield from _encode_chunk(chunk, start, signers, save)
+
 def test_encode_jwt(header, payload, secret):
     try:
         alg = header.get("alg")
@@ -49,17 +124,10 @@ def test_encode_jwt(header, payload, secret):
         encoder = JWTEncoder(header, payload)
         unsigned = encoder.encode()
 
-        if alg == "HS256":
-            sign = signer_hs256(secret)
-            verify = verify_hs256(secret)
-        else:
-            sign = signer_hs384(secret)
-            verify = verify_hs384(secret)
-
-        signature = sign(unsigned)
+        signature = sign_token(alg, secret, unsigned)
         jwt_final = f"{unsigned}.{signature}"
 
-        if not verify(unsigned, signature):
+        if not verify_token(alg, secret, unsigned, signature):
             return {
                 "status": "error",
                 "phase": "verification",
@@ -87,29 +155,33 @@ def test_encode_jwt(header, payload, secret):
             "payload": payload
         }
 
-def test_encode_list(test_cases):
-    results = []
-    try:
-        for t in test_cases:
-            result = test_encode_jwt(
-                t.get("header", {}),
-                t.get("payload", {}),
-                t.get("secret", "")
-            )
-            results.append(result)
-
-    except Exception as e:
-        results.append({
-            "status": "error",
-            "phase": "test_encode_list",
-            "message": str(e)
-        })
+def _test_encode_cases(test_cases):
+    """Bloque de trabajo de map_chunks (puede correr en otro proceso)."""
+    return [
+        test_encode_jwt(
+            t.get("header", {}),
+            t.get("payload", {}),
+            t.get("secret", "")
+        )
+        for t in test_cases
+    ]
+
+def _test_encode_failed(test_case, message):
+    return {
+        "status": "error",
+        "phase": "test_encode_list",
+        "message": message
+    }
 
-    return results
+def test_encode_list(test_cases):
+    """Prueba cada caso por bloques (en el pool de procesos si está activo), en orden."""
+    return map_chunks(_test_encode_cases, test_cases, _test_encode_failed)
 
 def test_encode_repository():
     try:
-        encoded_tokens = DatabaseConnector.find_encoded_tokens(limit=1000)
+        encoded_tokens = get_storage().find_encoded_tokens(
+            limit=1000, projection={"header": 1, "payload": 1, "secret": 1, "jwt": 1}
+        )
 
         if not encoded_tokens:
             return {
@@ -136,12 +208,7 @@ def test_encode_repository():
         passed = 0
         failed = 0
 
-        for case in test_cases:
-            result = test_encode_jwt(
-                case["header"],
-                case["payload"],
-                case["secret"]
-            )
+        for case, result in zip(test_cases, test_encode_list(test_cases)):
             result["original_jwt"] = case["original_jwt"]
 
             if result["status"] == "ok":
@@ -175,15 +242,25 @@ def test_encode_repository():
         }
 
 
-def get_encoded_tokens():
+def get_encoded_tokens(limit=1000, cursor=None):
+    """
+    Una página de tokens generados (sin el secreto), con el cursor de la siguiente.
+    Un cursor inválido lanza ValueError, como en list_analyses.
+    """
+    storage = get_storage()
+    if cursor:
+        storage.check_cursor(cursor)
     try:
-        tokens = DatabaseConnector.find_encoded_tokens(limit=1000)
+        tokens, next_cursor = storage.find_page(
+            "encoded_tokens", projection={"header": 1, "payload": 1, "jwt": 1}, limit=limit, cursor=cursor
+        )
 
-        if not tokens:
+        if not tokens and not cursor:
             return {
                 "status": "ok",
                 "message": "No hay tokens encriptados en el repositorio",
-                "results": []
+                "results": [],
+                "next_cursor": None
             }
 
         results = []
@@ -198,7 +275,8 @@ def get_encoded_tokens():
         return {
             "status": "ok",
             "total": len(results),
-            "results": results
+            "results": results,
+            "next_cursor": next_cursor
         }
 
     except Exception as e:
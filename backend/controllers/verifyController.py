@@ -0,0 +1,53 @@
+import time
+
+from controllers.analyzeController import analyze_list, verify_result
+from utils.verify import SignatureVerifier
+
+def _verification_row(result):
+    row = {
+        "token": result["token"],
+        "valid": result["status"] == "ok",
+        "status": result["status"],
+    }
+    if result["status"] == "ok":
+        row["kid"] = result["kid"]
+    else:
+        row["phase"] = result["phase"]
+        row["message"] = result["message"]
+    return row
+
+def verify_list(tokens, verifier: SignatureVerifier):
+    """
+    Analiza los tokens (con la caché y el front end por lotes de analyze_list) y
+    verifica la firma de los que pasan el análisis, todos con el mismo
+    verificador. Retorna un resultado por token, en orden, con el resumen y los
+    tiempos de cada etapa.
+    """
+    start = time.perf_counter()
+    analyzed = analyze_list(tokens, compact=True)
+    analyzed_at = time.perf_counter()
+
+    rows = []
+    for result in analyzed:
+        token = result.pop("token", None)
+        result = verify_result(token, result, verifier) if token is not None else result
+        result["token"] = token
+        rows.append(_verification_row(result))
+    finished = time.perf_counter()
+
+    valid = sum(1 for row in rows if row["valid"])
+    total_ms = (finished - start) * 1000
+    return {
+        "results": rows,
+        "summary": {
+            "total": len(rows),
+            "valid": valid,
+            "invalid": len(rows) - valid
+        },
+        "timing": {
+            "analysis_ms": round((analyzed_at - start) * 1000, 3),
+            "verification_ms": round((finished - analyzed_at) * 1000, 3),
+            "total_ms": round(total_ms, 3),
+            "per_token_us": round(total_ms * 1000 / len(rows), 3) if rows else 0
+        }
+    }
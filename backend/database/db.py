@@ -1,19 +1,71 @@
+import base64
+import json
 import os
+import threading
+import time
 import certifi
 from datetime import datetime
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Iterator, Optional, List, Tuple
 
-from pymongo import MongoClient
+from bson import ObjectId
+from bson.errors import InvalidId
+import pymongo
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne
 from pymongo.collection import Collection
 from pymongo.server_api import ServerApi
 
+from .storage import PAGE_SIZE, PAGE_SIZE_MAX, Storage
+from .writer import WriteBehindQueue
+from utils.hashing import token_hash
+from utils.metrics import DB_WRITE_DURATION
+
 MONGO_URI = MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = "JWT"
 MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "30000"))
 
-class DatabaseConnector:
+# Escritura diferida (write-behind): las inserciones se encolan y un hilo las
+# escribe por lotes con insert_many, fuera del hilo de la petición.
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "0") == "1"
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "200"))
+DB_WRITE_INTERVAL_MS = int(os.getenv("DB_WRITE_INTERVAL_MS", "500"))
+DB_WRITE_QUEUE = int(os.getenv("DB_WRITE_QUEUE", "10000"))
+DB_WRITE_PUT_TIMEOUT_MS = int(os.getenv("DB_WRITE_PUT_TIMEOUT_MS", "50"))
+
+# Índices de `analyses` de versiones anteriores: created_at y el sufijo token_hash
+# los cubre (created_at, _id), y ninguna consulta filtra por token
+STALE_INDEXES = ("created_at_1", "token_1", "created_at_-1__id_-1_token_hash_1")
+
+# Orden de los listados: más recientes primero, _id desempata documentos del mismo instante
+PAGE_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Cursor opaco que apunta justo después de `doc` en el orden PAGE_SORT."""
+    raw = json.dumps({"t": doc["created_at"].isoformat(), "i": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Filtro de MongoDB para los documentos que siguen al cursor. Lanza ValueError si es inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        created_at = datetime.fromisoformat(data["t"])
+        last_id = ObjectId(data["i"])
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise ValueError("cursor inválido")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+    ]}
+
+
+class DatabaseConnector(Storage):
     _client: Optional[MongoClient] = None
     _db = None
+    _writer: Optional[WriteBehindQueue] = None
+    _writer_lock = threading.Lock()
+    _indexes_ready = False
     
     def __init__(self):
         self._client = MongoClient(
@@ -34,6 +86,20 @@ class DatabaseConnector:
             cls._client.admin.command("ping")
         return cls._client
 
+    @classmethod
+    def ping(cls, timeout_ms: Optional[int] = None) -> None:
+        """Verifica que MongoDB responda (lanza la excepción de pymongo si no)."""
+        if timeout_ms is None:
+            cls.get_client().admin.command("ping")
+            return
+        # Acota también la selección de servidor, que si no espera MONGO_TIMEOUT_MS
+        with pymongo.timeout(timeout_ms / 1000):
+            cls.get_client().admin.command("ping")
+
+    @classmethod
+    def connect(cls) -> None:
+        cls.get_db()
+
     @classmethod
     def get_db(cls):
         if cls._db is None:
@@ -46,33 +112,186 @@ class DatabaseConnector:
         db = cls.get_db()
         return db[name]
 
+    @classmethod
+    def get_writer(cls) -> Optional[WriteBehindQueue]:
+        """Cola de escritura diferida, o None si DB_WRITE_BEHIND no está activo."""
+        if not DB_WRITE_BEHIND:
+            return None
+        with cls._writer_lock:
+            if cls._writer is None:
+                cls._writer = WriteBehindQueue(
+                    lambda name, docs: cls._timed_write(name, "insert_many", docs),
+                    batch_size=DB_WRITE_BATCH,
+                    flush_interval=DB_WRITE_INTERVAL_MS / 1000,
+                    maxsize=DB_WRITE_QUEUE,
+                    put_timeout=DB_WRITE_PUT_TIMEOUT_MS / 1000,
+                )
+                cls._writer.start()
+        return cls._writer
+
+    @classmethod
+    def shutdown_writer(cls) -> None:
+        """Escribe lo que quede en la cola diferida antes de apagar el proceso."""
+        if cls._writer is not None:
+            cls._writer.stop()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        cls.shutdown_writer()
+
+    @classmethod
+    def writer_stats(cls) -> Dict[str, Any]:
+        if cls._writer is None:
+            return {"enabled": DB_WRITE_BEHIND}
+        return {"enabled": True, **cls._writer.stats()}
+
+    @classmethod
+    def _timed_write(cls, name: str, operation: str, docs: List[Dict[str, Any]]):
+        """Ejecuta insert_one / insert_many registrando su latencia en /metrics."""
+        coll = cls.get_collection(name)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            if operation == "insert_one":
+                res = coll.insert_one(docs[0])
+            else:
+                res = coll.insert_many(docs, ordered=False)
+            outcome = "ok"
+            return res
+        finally:
+            DB_WRITE_DURATION.observe(time.perf_counter() - start, name, operation, outcome)
+
+    @classmethod
+    def _insert(cls, name: str, docs: List[Dict[str, Any]]) -> List[str]:
+        """
+        Inserta en la colección `name`. En modo write-behind los ids se generan
+        en el cliente y los documentos se encolan sin esperar a MongoDB.
+        """
+        writer = cls.get_writer()
+        if writer is None:
+            if len(docs) == 1:
+                return [str(cls._timed_write(name, "insert_one", docs).inserted_id)]
+            return [str(_id) for _id in cls._timed_write(name, "insert_many", docs).inserted_ids]
+
+        ids = []
+        for doc in docs:
+            doc["_id"] = ObjectId()
+            writer.submit(name, doc)
+            ids.append(str(doc["_id"]))
+        return ids
+
     @classmethod
     def init_indexes(cls) -> None:
-        """Crea índices útiles si aún no existen."""
+        """
+        Crea los índices si aún no existen. (created_at, _id) sirve el orden de
+        los listados, la paginación por cursor y los filtros por created_at del
+        análisis incremental: cada página recorre solo `limit` entradas del índice
+        y lee esos documentos (la proyección de los listados trae token y result.*,
+        que no están en el índice). (token_hash, created_at, _id) sirve las páginas
+        de ocurrencias de un mismo token. Borra los índices de versiones anteriores
+        que ya no usa ninguna consulta.
+        """
         coll = cls.get_collection("analyses")
-        coll.create_index("created_at")
-        coll.create_index("token")
+        existing = coll.index_information()
+        for name in STALE_INDEXES:
+            if name in existing:
+                coll.drop_index(name)
+        coll.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        coll.create_index([("token_hash", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        encoded = cls.get_collection("encoded_tokens")
+        encoded.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        verdicts = cls.get_collection("verdicts")
+        verdicts.create_index("analyzer_version")
+        verdicts.create_index("recheck_at", sparse=True)
+        cls._indexes_ready = True
+
+    @classmethod
+    def ensure_indexes(cls) -> None:
+        """init_indexes una sola vez por proceso (al arrancar o antes de la primera página)."""
+        if not cls._indexes_ready:
+            cls.init_indexes()
+
+    @classmethod
+    def check_cursor(cls, cursor: str) -> None:
+        decode_cursor(cursor)
+
+    @classmethod
+    def find_page(cls, name: str, filter_query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+                  limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Una página de la colección `name` en orden PAGE_SORT, a partir de `cursor`
+        (paginación por llave: cada página es una búsqueda por índice, sin skip).
+        Retorna los documentos con la proyección dada y el cursor de la página
+        siguiente, o None si no hay más.
+        """
+        cls.ensure_indexes()
+        limit = max(1, min(limit, PAGE_SIZE_MAX))
+        q = dict(filter_query or {})
+        if cursor:
+            q = {"$and": [q, decode_cursor(cursor)]} if q else decode_cursor(cursor)
+
+        # created_at y _id hacen falta para armar el cursor siguiente
+        fields = None
+        if projection is not None:
+            fields = {**projection, "created_at": 1, "_id": 1}
+
+        coll = cls.get_collection(name)
+        docs = list(coll.find(q, fields).sort(PAGE_SORT).limit(limit + 1))
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_cursor
     
     @classmethod
     def save_analysis(cls, token: str, result: Dict[str, Any]) -> str:
         """Inserta un documento de análisis y retorna el id como string."""
-        coll = cls.get_collection("analyses")
         doc = {
             "token": token,
+            "token_hash": token_hash(token),
             "result": result,
             "created_at": datetime.now(),
         }
-        res = coll.insert_one(doc)
-        return str(res.inserted_id)
+        return cls._insert("analyses", [doc])[0]
 
     @classmethod
-    def find_analyses(cls, filter_query: Dict[str, Any] = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """Consulta documentos en la colección `analyses`."""
+    def save_analyses(cls, items: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Inserta varios análisis (token, resultado) con un solo insert_many y retorna los ids."""
+        if not items:
+            return []
+        now = datetime.now()
+        docs = [
+            {"token": token, "token_hash": token_hash(token), "result": result, "created_at": now}
+            for token, result in items
+        ]
+        return cls._insert("analyses", docs)
+
+    @classmethod
+    def find_analyses(cls, filter_query: Dict[str, Any] = None, limit: int = 50,
+                      projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Consulta documentos en la colección `analyses` (solo los campos de `projection`, si se da)."""
         coll = cls.get_collection("analyses")
         q = filter_query or {}
-        cursor = coll.find(q).sort("created_at", -1).limit(limit)
+        cursor = coll.find(q, projection).sort("created_at", -1).limit(limit)
         return list(cursor)
 
+    @classmethod
+    def iter_analyses(cls, filter_query: Dict[str, Any] = None, batch_size: int = 500,
+                      projection: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre la colección `analyses` completa (más recientes primero) con un cursor
+        que trae `batch_size` documentos por viaje, sin cargarlos todos en memoria.
+        """
+        coll = cls.get_collection("analyses")
+        q = filter_query or {}
+        cursor = (
+            coll.find(q, projection)
+            .sort("created_at", -1)
+            .batch_size(batch_size)
+            .allow_disk_use(True)
+        )
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
     @classmethod
     def clear_analyses(cls) -> int:
         """Elimina todos los documentos en la colección `analyses` y retorna el conteo."""
@@ -80,10 +299,55 @@ class DatabaseConnector:
         res = coll.delete_many({})
         return res.deleted_count
     
+    @classmethod
+    def find_verdicts(cls, hashes: List[str], chunk_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+        """Veredictos guardados de los hashes dados, indexados por hash."""
+        coll = cls.get_collection("verdicts")
+        found = {}
+        for i in range(0, len(hashes), chunk_size):
+            for doc in coll.find({"_id": {"$in": hashes[i:i + chunk_size]}}):
+                found[doc["_id"]] = doc
+        return found
+
+    @classmethod
+    def iter_stale_verdicts(cls, analyzer_version: str, now: datetime) -> Iterator[Dict[str, Any]]:
+        """Veredictos de otra versión del analizador o cuyo recheck_at ya pasó."""
+        coll = cls.get_collection("verdicts")
+        cursor = coll.find({"$or": [
+            {"analyzer_version": {"$ne": analyzer_version}},
+            {"recheck_at": {"$lte": now}},
+        ]})
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    @classmethod
+    def save_verdicts(cls, docs: List[Dict[str, Any]]) -> None:
+        """Reemplaza (o crea) los veredictos por su _id con un solo bulk_write."""
+        if not docs:
+            return
+        coll = cls.get_collection("verdicts")
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            coll.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+            outcome = "ok"
+        finally:
+            DB_WRITE_DURATION.observe(time.perf_counter() - start, "verdicts", "bulk_write", outcome)
+
+    @classmethod
+    def get_analysis_state(cls, name: str) -> Optional[Dict[str, Any]]:
+        """Estado persistido de un análisis incremental (watermark, versión, resumen)."""
+        return cls.get_collection("analysis_state").find_one({"_id": name})
+
+    @classmethod
+    def save_analysis_state(cls, name: str, state: Dict[str, Any]) -> None:
+        cls.get_collection("analysis_state").replace_one({"_id": name}, {**state, "_id": name}, upsert=True)
+
     @classmethod
     def save_encoded_token(cls, request_data: Dict[str, Any], jwt_result: Dict[str, Any]) -> str:
         """Inserta un documento de token encriptado y retorna el id como string."""
-        coll = cls.get_collection("encoded_tokens")
         doc = {
             "header": request_data.get("header"),
             "payload": request_data.get("payload"),
@@ -91,15 +355,33 @@ class DatabaseConnector:
             "jwt": jwt_result.get("jwt"),
             "created_at": datetime.now(),
         }
-        res = coll.insert_one(doc)
-        return str(res.inserted_id)
+        return cls._insert("encoded_tokens", [doc])[0]
     
     @classmethod
-    def find_encoded_tokens(cls, filter_query: Dict[str, Any] = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """Consulta documentos en la colección `encoded_tokens`."""
+    def save_encoded_tokens(cls, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[str]:
+        """Inserta varios tokens encriptados (datos de la petición, resultado) con un solo insert_many."""
+        if not items:
+            return []
+        now = datetime.now()
+        docs = [
+            {
+                "header": request_data.get("header"),
+                "payload": request_data.get("payload"),
+                "secret": request_data.get("secret"),
+                "jwt": jwt_result.get("jwt"),
+                "created_at": now,
+            }
+            for request_data, jwt_result in items
+        ]
+        return cls._insert("encoded_tokens", docs)
+
+    @classmethod
+    def find_encoded_tokens(cls, filter_query: Dict[str, Any] = None, limit: int = 50,
+                            projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Consulta documentos en la colección `encoded_tokens` (solo los campos de `projection`, si se da)."""
         coll = cls.get_collection("encoded_tokens")
         q = filter_query or {}
-        cursor = coll.find(q).sort("created_at", -1).limit(limit)
+        cursor = coll.find(q, projection).sort("created_at", -1).limit(limit)
         return list(cursor)
     
     @classmethod
@@ -0,0 +1,475 @@
+"""
+Backend de almacenamiento embebido sobre SQLite.
+
+Un archivo (SQLITE_PATH) en modo WAL: las lecturas no bloquean a la escritura ni
+al revés, y con synchronous=NORMAL cada commit no espera un fsync. Cada hilo usa
+su propia conexión, con las sentencias compiladas en su caché (las consultas se
+arman siempre con el mismo texto y parámetros ?, así se preparan una sola vez).
+Cada save_* es una sola transacción con executemany, sin importar cuántos
+documentos lleve.
+
+Los documentos se guardan en columnas (las que se filtran u ordenan tienen
+índice) y los valores anidados como JSON; los instantes van como texto ISO de
+ancho fijo, que ordena igual que el datetime.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .storage import PAGE_SIZE, PAGE_SIZE_MAX, Storage
+from utils.hashing import token_hash
+from utils.metrics import DB_WRITE_DURATION
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "jwt_analyzer.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# Columnas de cada colección y cómo se guardan: texto, JSON o instante.
+# `_id` es la clave primaria (entera en las colecciones con id generado).
+COLLECTIONS = {
+    "analyses": {"token": "text", "token_hash": "text", "result": "json", "created_at": "time"},
+    "encoded_tokens": {"header": "json", "payload": "json", "secret": "text", "jwt": "text", "created_at": "time"},
+    "verdicts": {"analyzer_version": "text", "recheck_at": "time", "doc": "json"},
+    "analysis_state": {"doc": "json"},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY, token TEXT, token_hash TEXT, result TEXT, created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS encoded_tokens (
+    id INTEGER PRIMARY KEY, header TEXT, payload TEXT, secret TEXT, jwt TEXT, created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS verdicts (
+    id TEXT PRIMARY KEY, analyzer_version TEXT, recheck_at TEXT, doc TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS analysis_state (
+    id TEXT PRIMARY KEY, doc TEXT
+) WITHOUT ROWID;
+"""
+
+# Los mismos que init_indexes en MongoDB
+INDEXES = """
+DROP INDEX IF EXISTS analyses_created_at;
+DROP INDEX IF EXISTS analyses_token;
+DROP INDEX IF EXISTS analyses_page;
+CREATE INDEX IF NOT EXISTS analyses_created_page ON analyses (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS analyses_hash_page ON analyses (token_hash, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS encoded_tokens_page ON encoded_tokens (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS verdicts_version ON verdicts (analyzer_version);
+CREATE INDEX IF NOT EXISTS verdicts_recheck_at ON verdicts (recheck_at) WHERE recheck_at IS NOT NULL;
+"""
+
+_OPERATORS = {"$lt": "<", "$lte": "<=", "$gt": ">", "$gte": ">="}
+
+
+def _ts(value: datetime) -> str:
+    return value.strftime(_TIME_FORMAT)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"$date": _ts(value)}
+    raise TypeError(f"No se puede guardar {type(value).__name__} como JSON")
+
+
+def _json_hook(obj):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.strptime(obj["$date"], _TIME_FORMAT)
+    return obj
+
+
+def _dumps(value) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+def _loads(text: Optional[str]):
+    return None if text is None else json.loads(text, object_hook=_json_hook)
+
+
+def _to_column(kind: str, value):
+    if value is None:
+        return None
+    if kind == "json":
+        return _dumps(value)
+    if kind == "time":
+        return _ts(value)
+    return value
+
+
+def _from_column(kind: str, value):
+    if value is None:
+        return None
+    if kind == "json":
+        return _loads(value)
+    if kind == "time":
+        return datetime.strptime(value, _TIME_FORMAT)
+    return value
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aplica una proyección de inclusión de MongoDB ({"a": 1, "b.c": 1}); `_id` siempre va."""
+    if projection is None:
+        return doc
+    out = {"_id": doc["_id"]}
+    for path, include in projection.items():
+        if not include:
+            continue
+        source, target = doc, out
+        *parents, leaf = path.split(".")
+        for key in parents:
+            source = source.get(key) if isinstance(source, dict) else None
+            if source is None:
+                break
+            target = target.setdefault(key, {})
+        else:
+            if isinstance(source, dict) and leaf in source:
+                target[leaf] = source[leaf]
+    return out
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    raw = json.dumps({"t": created_at, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(created_at, id) del último documento de la página. Lanza ValueError si es inválido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created_at = _ts(datetime.strptime(data["t"], _TIME_FORMAT))
+        row_id = data["i"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("cursor inválido")
+    if not isinstance(row_id, int):
+        raise ValueError("cursor inválido")
+    return created_at, row_id
+
+
+class SQLiteStorage(Storage):
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._indexes_ready = False
+
+    # Conexión
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        # isolation_level=None: sin transacciones implícitas; las escrituras
+        # abren la suya con BEGIN IMMEDIATE en _write
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def connect(self) -> None:
+        self._conn()
+        self.ping()
+
+    def ping(self, timeout_ms: Optional[int] = None) -> None:
+        # Un archivo local: SELECT 1 no espera a nadie
+        self._conn().execute("SELECT 1").fetchone()
+
+    def init_indexes(self) -> None:
+        self._conn().executescript(INDEXES)
+        self._indexes_ready = True
+
+    def ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            self.init_indexes()
+
+    def writer_stats(self) -> Dict[str, Any]:
+        # Cada save_* ya es una transacción local por lotes; no hay cola diferida
+        return {"enabled": False, "backend": "sqlite"}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def _write(self, name: str, operation: str, fn):
+        """Ejecuta fn(conn) en una transacción de escritura, registrando su latencia en /metrics."""
+        conn = self._conn()
+        start = time.perf_counter()
+        outcome = "error"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            res = fn(conn)
+            conn.execute("COMMIT")
+            outcome = "ok"
+            return res
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            DB_WRITE_DURATION.observe(time.perf_counter() - start, name, operation, outcome)
+
+    # Documentos <-> filas
+
+    def _insert(self, name: str, docs: List[Dict[str, Any]]) -> List[str]:
+        """
+        Inserta los documentos con ids consecutivos asignados dentro de la misma
+        transacción (BEGIN IMMEDIATE toma el lock de escritura antes de leer el máximo).
+        """
+        columns = COLLECTIONS[name]
+        sql = f"INSERT INTO {name} (id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})"
+
+        def insert(conn):
+            first = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {name}").fetchone()[0]
+            rows = [
+                (first + i, *(_to_column(kind, doc.get(field)) for field, kind in columns.items()))
+                for i, doc in enumerate(docs)
+            ]
+            conn.executemany(sql, rows)
+            return [str(first + i) for i in range(len(docs))]
+
+        return self._write(name, "insert_one" if len(docs) == 1 else "insert_many", insert)
+
+    @staticmethod
+    def _fields(name: str, projection: Optional[Dict[str, Any]]) -> List[str]:
+        """Columnas que hay que leer para la proyección (todas si no hay)."""
+        columns = COLLECTIONS[name]
+        if projection is None:
+            return list(columns)
+        wanted = {path.split(".", 1)[0] for path, include in projection.items() if include}
+        return [field for field in columns if field in wanted]
+
+    @staticmethod
+    def _row_doc(name: str, fields: List[str], row) -> Dict[str, Any]:
+        columns = COLLECTIONS[name]
+        doc = {"_id": row[0]}
+        for field, value in zip(fields, row[1:]):
+            doc[field] = _from_column(columns[field], value)
+        return doc
+
+    @staticmethod
+    def _where(name: str, filter_query: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """Traduce un filtro de MongoDB (igualdad y operadores de comparación por campo) a SQL."""
+        if not filter_query:
+            return "", []
+        columns = COLLECTIONS[name]
+        clauses, params = [], []
+        for field, condition in filter_query.items():
+            column = "id" if field == "_id" else field
+            kind = "text" if field == "_id" else columns.get(field)
+            if kind is None or kind == "json":
+                raise ValueError(f"Filtro no soportado en {name}: {field}")
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$eq":
+                    clauses.append(f"{column} = ?")
+                    params.append(_to_column(kind, value))
+                elif op == "$ne":
+                    clauses.append(f"({column} IS NULL OR {column} != ?)")
+                    params.append(_to_column(kind, value))
+                elif op == "$in":
+                    values = [_to_column(kind, v) for v in value]
+                    clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else "0")
+                    params.extend(values)
+                elif op in _OPERATORS:
+                    clauses.append(f"{column} {_OPERATORS[op]} ?")
+                    params.append(_to_column(kind, value))
+                else:
+                    raise ValueError(f"Operador no soportado en {name}.{field}: {op}")
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _select(self, name: str, filter_query, projection, limit: Optional[int] = None):
+        fields = self._fields(name, projection)
+        where, params = self._where(name, filter_query)
+        sql = f"SELECT id{''.join(', ' + f for f in fields)} FROM {name}{where} ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return fields, self._conn().execute(sql, params)
+
+    def _find(self, name: str, filter_query, limit: int, projection) -> List[Dict[str, Any]]:
+        fields, cursor = self._select(name, filter_query, projection, limit)
+        return [_project(self._row_doc(name, fields, row), projection) for row in cursor.fetchall()]
+
+    # Listados paginados
+
+    def check_cursor(self, cursor: str) -> None:
+        decode_cursor(cursor)
+
+    def find_page(self, name: str, filter_query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+                  limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self.ensure_indexes()
+        limit = max(1, min(limit, PAGE_SIZE_MAX))
+        if projection is not None:
+            projection = {**projection, "created_at": 1}
+
+        fields = self._fields(name, projection)
+        where, params = self._where(name, filter_query)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            where += " AND " if where else " WHERE "
+            where += "(created_at < ? OR (created_at = ? AND id < ?))"
+            params += [created_at, created_at, row_id]
+
+        sql = f"SELECT id{''.join(', ' + f for f in fields)} FROM {name}{where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._conn().execute(sql, params + [limit + 1]).fetchall()
+        docs = [_project(self._row_doc(name, fields, row), projection) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = docs[-1]
+            next_cursor = encode_cursor(_ts(last["created_at"]), last["_id"])
+        return docs, next_cursor
+
+    # Análisis
+
+    def save_analysis(self, token: str, result: Dict[str, Any]) -> str:
+        return self.save_analyses([(token, result)])[0]
+
+    def save_analyses(self, items: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        if not items:
+            return []
+        now = datetime.now()
+        docs = [
+            {"token": token, "token_hash": token_hash(token), "result": result, "created_at": now}
+            for token, result in items
+        ]
+        return self._insert("analyses", docs)
+
+    def find_analyses(self, filter_query: Dict[str, Any] = None, limit: int = 50,
+                      projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self._find("analyses", filter_query, limit, projection)
+
+    def iter_analyses(self, filter_query: Dict[str, Any] = None, batch_size: int = 500,
+                      projection: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        fields, cursor = self._select("analyses", filter_query, projection)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _project(self._row_doc("analyses", fields, row), projection)
+        finally:
+            cursor.close()
+
+    def clear_analyses(self) -> int:
+        return self._write("analyses", "delete_many", lambda conn: conn.execute("DELETE FROM analyses").rowcount)
+
+    # Veredictos y estado del análisis incremental
+
+    @staticmethod
+    def _doc_row(row) -> Dict[str, Any]:
+        doc = _loads(row[1])
+        doc["_id"] = row[0]
+        return doc
+
+    def find_verdicts(self, hashes: List[str], chunk_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+        conn = self._conn()
+        found = {}
+        for i in range(0, len(hashes), chunk_size):
+            chunk = hashes[i:i + chunk_size]
+            sql = f"SELECT id, doc FROM verdicts WHERE id IN ({', '.join('?' * len(chunk))})"
+            for row in conn.execute(sql, chunk):
+                found[row[0]] = self._doc_row(row)
+        return found
+
+    def iter_stale_verdicts(self, analyzer_version: str, now: datetime) -> Iterator[Dict[str, Any]]:
+        cursor = self._conn().execute(
+            "SELECT id, doc FROM verdicts WHERE analyzer_version != ? OR recheck_at <= ?",
+            (analyzer_version, _ts(now)),
+        )
+        try:
+            for row in cursor:
+                yield self._doc_row(row)
+        finally:
+            cursor.close()
+
+    def save_verdicts(self, docs: List[Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        rows = [
+            (
+                doc["_id"],
+                doc.get("analyzer_version"),
+                _to_column("time", doc.get("recheck_at")),
+                _dumps({k: v for k, v in doc.items() if k != "_id"}),
+            )
+            for doc in docs
+        ]
+        self._write("verdicts", "bulk_write", lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO verdicts (id, analyzer_version, recheck_at, doc) VALUES (?, ?, ?, ?)", rows
+        ))
+
+    def get_analysis_state(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT id, doc FROM analysis_state WHERE id = ?", (name,)).fetchone()
+        return self._doc_row(row) if row is not None else None
+
+    def save_analysis_state(self, name: str, state: Dict[str, Any]) -> None:
+        doc = _dumps({k: v for k, v in state.items() if k != "_id"})
+        self._write("analysis_state", "replace_one", lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO analysis_state (id, doc) VALUES (?, ?)", (name, doc)
+        ))
+
+    # Tokens generados
+
+    def save_encoded_token(self, request_data: Dict[str, Any], jwt_result: Dict[str, Any]) -> str:
+        return self.save_encoded_tokens([(request_data, jwt_result)])[0]
+
+    def save_encoded_tokens(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[str]:
+        if not items:
+            return []
+        now = datetime.now()
+        docs = [
+            {
+                "header": request_data.get("header"),
+                "payload": request_data.get("payload"),
+                "secret": request_data.get("secret"),
+                "jwt": jwt_result.get("jwt"),
+                "created_at": now,
+            }
+            for request_data, jwt_result in items
+        ]
+        return self._insert("encoded_tokens", docs)
+
+    def find_encoded_tokens(self, filter_query: Dict[str, Any] = None, limit: int = 50,
+                            projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self._find("encoded_tokens", filter_query, limit, projection)
+
+    def clear_encoded_tokens(self) -> int:
+        return self._write(
+            "encoded_tokens", "delete_many", lambda conn: conn.execute("DELETE FROM encoded_tokens").rowcount
+        )
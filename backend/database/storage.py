@@ -0,0 +1,163 @@
+"""
+Interfaz de almacenamiento de los controladores.
+
+Los controladores y las rutas guardan y consultan análisis, tokens generados,
+veredictos y el estado del análisis incremental a través de get_storage(), sin
+depender del motor. STORAGE_BACKEND elige la implementación:
+
+- "mongo" (por defecto): DatabaseConnector sobre MongoDB (database/db.py).
+- "sqlite": SQLiteStorage embebido en SQLITE_PATH (database/sqlite.py), para
+  despliegues de un solo nodo y benchmarks reproducibles sin un clúster.
+
+Los filtros usan la sintaxis de MongoDB; los backends que no son Mongo admiten
+el subconjunto que usan los controladores: igualdad y $lt/$lte/$gt/$gte/$ne/$in
+sobre campos de primer nivel.
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+# Tamaño de página por defecto y máximo de los listados paginados
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+Doc = Dict[str, Any]
+
+
+class Storage(ABC):
+    """
+    Operaciones que cada backend implementa (un backend al que le falte alguna
+    no se puede instanciar). Los documentos se retornan como dicts con `_id`;
+    `created_at` y los demás instantes son datetime.
+    """
+
+    # Conexión y ciclo de vida
+
+    @abstractmethod
+    def connect(self) -> None:
+        """Abre la conexión y verifica que el motor responda."""
+
+    @abstractmethod
+    def ping(self, timeout_ms: Optional[int] = None) -> None:
+        """
+        Verifica que el motor responda; lanza su excepción si no. Con `timeout_ms`
+        falla en ese tiempo en vez de esperar el timeout de conexión (sondas).
+        """
+
+    @abstractmethod
+    def ensure_indexes(self) -> None:
+        """Crea los índices una sola vez por proceso."""
+
+    def get_writer(self):
+        """Cola de escritura diferida, o None si el backend no la usa."""
+        return None
+
+    def writer_stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+    def shutdown(self) -> None:
+        """Escribe lo pendiente antes de apagar el proceso."""
+
+    # Listados paginados
+
+    @abstractmethod
+    def check_cursor(self, cursor: str) -> None:
+        """Lanza ValueError si `cursor` no es un cursor de find_page de este backend."""
+
+    @abstractmethod
+    def find_page(self, name: str, filter_query: Doc = None, projection: Doc = None,
+                  limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[Doc], Optional[str]]:
+        """
+        Una página de la colección `name`, más recientes primero, a partir de
+        `cursor`. Retorna los documentos y el cursor de la siguiente (o None).
+        """
+
+    # Análisis
+
+    @abstractmethod
+    def save_analysis(self, token: str, result: Doc) -> str:
+        ...
+
+    @abstractmethod
+    def save_analyses(self, items: List[Tuple[str, Doc]]) -> List[str]:
+        ...
+
+    @abstractmethod
+    def find_analyses(self, filter_query: Doc = None, limit: int = 50,
+                      projection: Doc = None) -> List[Doc]:
+        ...
+
+    @abstractmethod
+    def iter_analyses(self, filter_query: Doc = None, batch_size: int = 500,
+                      projection: Doc = None) -> Iterator[Doc]:
+        ...
+
+    @abstractmethod
+    def clear_analyses(self) -> int:
+        ...
+
+    # Veredictos y estado del análisis incremental
+
+    @abstractmethod
+    def find_verdicts(self, hashes: List[str], chunk_size: int = 1000) -> Dict[str, Doc]:
+        ...
+
+    @abstractmethod
+    def iter_stale_verdicts(self, analyzer_version: str, now) -> Iterator[Doc]:
+        ...
+
+    @abstractmethod
+    def save_verdicts(self, docs: List[Doc]) -> None:
+        ...
+
+    @abstractmethod
+    def get_analysis_state(self, name: str) -> Optional[Doc]:
+        ...
+
+    @abstractmethod
+    def save_analysis_state(self, name: str, state: Doc) -> None:
+        ...
+
+    # Tokens generados
+
+    @abstractmethod
+    def save_encoded_token(self, request_data: Doc, jwt_result: Doc) -> str:
+        ...
+
+    @abstractmethod
+    def save_encoded_tokens(self, items: List[Tuple[Doc, Doc]]) -> List[str]:
+        ...
+
+    @abstractmethod
+    def find_encoded_tokens(self, filter_query: Doc = None, limit: int = 50,
+                            projection: Doc = None) -> List[Doc]:
+        ...
+
+    @abstractmethod
+    def clear_encoded_tokens(self) -> int:
+        ...
+
+
+_storage = None
+
+
+def get_storage() -> Storage:
+    """Backend elegido por STORAGE_BACKEND (se crea en la primera llamada)."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "sqlite":
+            from .sqlite import SQLiteStorage
+            _storage = SQLiteStorage()
+        elif STORAGE_BACKEND == "mongo":
+            from .db import DatabaseConnector
+            # Todas sus operaciones son classmethods: la clase hace de instancia.
+            # Como no se instancia, se revisa aquí lo que ABC revisaría al crearla
+            if DatabaseConnector.__abstractmethods__:
+                missing = ", ".join(sorted(DatabaseConnector.__abstractmethods__))
+                raise TypeError(f"DatabaseConnector no implementa: {missing}")
+            _storage = DatabaseConnector
+        else:
+            raise ValueError(f"STORAGE_BACKEND no soportado: {STORAGE_BACKEND}")
+    return _storage
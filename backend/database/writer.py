@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+class WriteBehindQueue:
+    """
+    Cola acotada de inserciones diferidas. Un hilo en segundo plano agrupa los
+    documentos por colección y los escribe con insert_many cuando se junta
+    `batch_size` documentos o pasan `flush_interval` segundos, lo que ocurra primero.
+
+    Si la cola está llena, submit espera hasta `put_timeout` segundos (contrapresión)
+    y después descarta el documento; ambos casos quedan contados en stats().
+    """
+
+    def __init__(self, insert_many: Callable[[str, List[Dict[str, Any]]], None],
+                 batch_size: int = 200, flush_interval: float = 0.5,
+                 maxsize: int = 10000, put_timeout: float = 0.05):
+        self._insert_many = insert_many
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.blocked = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.submit_seconds = 0.0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+                self._thread.start()
+
+    def submit(self, collection: str, doc: Dict[str, Any]) -> bool:
+        """Encola un documento. Retorna False si se descartó por sobrecarga."""
+        if self._thread is None:
+            self.start()
+
+        started = time.perf_counter()
+        item = (collection, doc)
+        accepted = True
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self.blocked += 1
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                accepted = False
+
+        with self._stats_lock:
+            if accepted:
+                self.enqueued += 1
+            else:
+                self.dropped += 1
+            self.submit_seconds += time.perf_counter() - started
+        return accepted
+
+    def _run(self) -> None:
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        count = 0
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                collection, doc = self._queue.get(timeout=timeout)
+                pending.setdefault(collection, []).append(doc)
+                count += 1
+            except queue.Empty:
+                pass
+
+            stopping = self._stopping.is_set() and self._queue.empty()
+            if count >= self.batch_size or time.monotonic() >= deadline or stopping:
+                if count:
+                    self._flush(pending)
+                    pending = {}
+                    count = 0
+                deadline = time.monotonic() + self.flush_interval
+
+            if stopping:
+                return
+
+    def _flush(self, pending: Dict[str, List[Dict[str, Any]]]) -> None:
+        for collection, docs in pending.items():
+            started = time.perf_counter()
+            try:
+                self._insert_many(collection, docs)
+                ok = True
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+
+            with self._stats_lock:
+                self.flushes += 1
+                self.flush_seconds += elapsed
+                if ok:
+                    self.written += len(docs)
+                else:
+                    self.failed += len(docs)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Vacía la cola escribiendo todo lo pendiente y detiene el hilo."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "blocked": self.blocked,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "flush_seconds_total": round(self.flush_seconds, 6),
+                "submit_seconds_total": round(self.submit_seconds, 6),
+            }
@@ -1,4 +1,6 @@
-from .tokens import TokenType
+import re
+
+from .tokens import TokenType, TokenStream
 
 class LexerDecoded:
 
@@ -7,87 +9,138 @@ class LexerDecoded:
         + ['{', '}', ':', ',', '"', ' ','-', '_', '@']
     )
 
-    def __init__(self, json_text: str):
+    # AFD de Σ₂ compilado en un único patrón: los espacios se consumen como
+    # prefijo de cada token y "other" captura el primer carácter que ningún token acepta.
+    SCANNER = re.compile(
+        r' *(?:'
+        r'(?P<punct>[{}:,])'
+        r'|"(?P<string>[A-Za-z0-9 ]*)(?P<close>"?)'
+        r'|(?P<boolean>true|false)'
+        r'|(?P<word>[A-Za-z0-9]+)'
+        r'|(?P<other>[^ ]))',
+        re.DOTALL
+    )
+
+    # El mismo AFD para TokenStream (spans=True): cada signo de puntuación tiene
+    # su propio grupo para que m.lastindex dé el tipo.
+    SPAN_SCANNER = re.compile(
+        r' *(?:'
+        r'(?P<l_brace>\{)|(?P<r_brace>\})|(?P<colon>:)|(?P<comma>,)'
+        r'|"(?P<string>[A-Za-z0-9 ]*)(?P<close>"?)'
+        r'|(?P<boolean>true|false)'
+        r'|(?P<word>[A-Za-z0-9]+)'
+        r'|(?P<other>[^ ]))',
+        re.DOTALL
+    )
+
+    # Los tokens de puntuación son siempre iguales: se comparten las tuplas
+    PUNCTUATION = {
+        '{': (TokenType.L_BRACE, '{'),
+        '}': (TokenType.R_BRACE, '}'),
+        ',': (TokenType.COMMA, ','),
+        ':': (TokenType.COLON, ':'),
+    }
+
+    # Grupo de SPAN_SCANNER con el que termina cada token -> TokenType. Un STRING
+    # entre comillas termina con "close", que siempre participa aunque la comilla falte.
+    GROUP_TYPES = {
+        "l_brace": TokenType.L_BRACE,
+        "r_brace": TokenType.R_BRACE,
+        "colon": TokenType.COLON,
+        "comma": TokenType.COMMA,
+        "close": TokenType.STRING,
+        "boolean": TokenType.BOOLEAN,
+        "word": TokenType.STRING,
+    }
+
+    OUTSIDE_ALPHABET = re.compile(r'[^A-Za-z0-9{}:," \-_@]')
+
+    def __init__(self, json_text: str, spans: bool = False):
         self.json = json_text
-        self.tokens = []
-        self.i = 0
+        # Lista de (TokenType, str); con `spans`, un TokenStream (menos memoria, más lento)
+        self.spans = spans
+        self.tokens = TokenStream(json_text) if spans else []
 
-    def verify_alphabet(self):
-        for ch in self.json:
-            if ch not in self.ALPHABET:
-                raise ValueError(f"Error léxico (decodificado): carácter '{ch}' fuera de Σ₂")
+    def verify_alphabet(self, start: int = 0):
+        bad = self.OUTSIDE_ALPHABET.search(self.json, start)
+        if bad:
+            raise ValueError(f"Error léxico (decodificado): carácter '{bad.group()}' fuera de Σ₂")
 
     def tokenize(self):
-        text = self.json
-        length = len(text)
-
-        while self.i < length:
-            ch = text[self.i]
-
-            if ch.isspace():
-                self.i += 1
-                continue
-
-            if ch == '{':
-                self.tokens.append((TokenType.L_BRACE, ch))
-                self.i += 1
-                continue
-
-            if ch == '}':
-                self.tokens.append((TokenType.R_BRACE, ch))
-                self.i += 1
-                continue
-
-            if ch == ',':
-                self.tokens.append((TokenType.COMMA, ch))
-                self.i += 1
-                continue
-
-            if ch == ':':
-                self.tokens.append((TokenType.COLON, ch))
-                self.i += 1
-                continue
-
-            if ch == '"':
-                self.i += 1
-                start = self.i
-
-                while self.i < length and text[self.i] != '"':
-                    if not (text[self.i].isalnum() or text[self.i] == " "):
-                        raise ValueError(
-                            "STRING inválido: solo letras, números y espacios permitidos según el AFD"
-                        )
-                    self.i += 1
-
-                value = text[start:self.i]
-                self.tokens.append((TokenType.STRING, value))
-                self.i += 1
-                continue
-
-            if text.startswith("true", self.i):
-                self.tokens.append((TokenType.BOOLEAN, "true"))
-                self.i += 4
-                continue
-
-            if text.startswith("false", self.i):
-                self.tokens.append((TokenType.BOOLEAN, "false"))
-                self.i += 5
-                continue
-
-            if ch.isalnum():
-                start = self.i
-                while self.i < length and text[self.i].isalnum():
-                    self.i += 1
-                value = text[start:self.i]
-                self.tokens.append((TokenType.STRING, value))
-                continue
-
-            raise ValueError(
-                f"Caracter inesperado: '{ch}' en posición {self.i}"
-            )
+        """
+        Verifica Σ₂ y emite los tokens en una sola pasada. Todo lo que consume el
+        patrón pertenece a Σ₂, así que solo ante un error se vuelve a recorrer el
+        texto para reportarlo con el mismo mensaje y posición que antes.
+        """
+        if self.spans:
+            return self._tokenize_spans()
+
+        append = self.tokens.append
+        punctuation = self.PUNCTUATION
+        unclosed = False
+
+        for punct, string, close, boolean, word, other in self.SCANNER.findall(self.json):
+            if unclosed or other:
+                self._raise_error()
+
+            if punct:
+                append(punctuation[punct])
+            elif boolean:
+                append((TokenType.BOOLEAN, boolean))
+            elif word:
+                append((TokenType.STRING, word))
+            else:
+                append((TokenType.STRING, string))
+                unclosed = not close
 
         return self.tokens
 
+    def _tokenize_spans(self):
+        groups = self.SPAN_SCANNER.groupindex
+        codes = [None] * (len(groups) + 1)
+        for name, token_type in self.GROUP_TYPES.items():
+            codes[groups[name]] = self.tokens.CODES[token_type]
+        STRING, CLOSE, OTHER = groups["string"], groups["close"], groups["other"]
+
+        add_type = self.tokens.types.append
+        add_start = self.tokens.starts.append
+        add_end = self.tokens.ends.append
+        unclosed = False
+
+        for m in self.SPAN_SCANNER.finditer(self.json):
+            group = m.lastindex
+            if unclosed or group == OTHER:
+                self._raise_error()
+
+            if group == CLOSE:
+                start, end = m.span(STRING)
+                # Sin comilla de cierre el STRING termina justo donde termina el match
+                unclosed = end == m.end()
+            else:
+                start, end = m.span(group)
+
+            add_type(codes[group])
+            add_start(start)
+            add_end(end)
+
+        return self.tokens
+
+    def _raise_error(self):
+        text = self.json
+
+        for m in self.SCANNER.finditer(text):
+            if m.group("other"):
+                pos = m.start("other")
+                self.verify_alphabet(pos)
+                raise ValueError(
+                    f"Caracter inesperado: '{m.group('other')}' en posición {pos}"
+                )
+
+            if m.start("string") != -1 and not m.group("close") and m.end() < len(text):
+                self.verify_alphabet(m.end())
+                raise ValueError(
+                    "STRING inválido: solo letras, números y espacios permitidos según el AFD"
+                )
+
     def analyze(self):
-        self.verify_alphabet()
         return self.tokenize()
@@ -1,13 +1,16 @@
 import re
-from .tokens import TokenType
+from .tokens import TokenType, TokenStream
 
 class EncodedLexer:
 
     BASE64URL_REGEX = r'^[A-Za-z0-9\-_]+$' 
 
-    def __init__(self, token_str: str):
+    def __init__(self, token_str: str, spans: bool = False):
         self.token_str = token_str.strip()
-        self.tokens = []
+        # Lista de (TokenType, str); con `spans`, un TokenStream
+        self.spans = spans
+        self.tokens = TokenStream(self.token_str) if spans else []
+        self._offset = 0
     
     def tokenize(self):
 
@@ -29,4 +32,11 @@ class EncodedLexer:
         if not re.match(self.BASE64URL_REGEX, segment):
             raise ValueError(f"Segmento inválido según Σ₁: {segment}")
 
-        self.tokens.append((token_type, segment))
+        if not self.spans:
+            self.tokens.append((token_type, segment))
+            return
+
+        start = self._offset
+        self.tokens.append(token_type, start, start + len(segment))
+        # Siguiente segmento: después del '.' que separa
+        self._offset = start + len(segment) + 1
@@ -1,3 +1,4 @@
+from array import array
 from enum import Enum
 
 class TokenType(Enum):
@@ -11,3 +12,94 @@ class TokenType(Enum):
     COLON = "COLON"          
     COMMA = "COMMA"          
     BOOLEAN = "BOOLEAN"      
+
+
+class TokenStream:
+    """
+    Secuencia compacta de tokens: por cada token guarda un código de tipo
+    (un byte) y sus posiciones (inicio, fin) en el texto fuente. El valor se
+    corta del texto solo cuando alguien lo pide; indexar o iterar produce las
+    mismas tuplas (TokenType, str) de siempre y to_list() da la lista completa.
+    """
+
+    __slots__ = ("source", "types", "starts", "ends")
+
+    TYPES = tuple(TokenType)
+    CODES = {token_type: code for code, token_type in enumerate(TYPES)}
+
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    @classmethod
+    def from_spans(cls, source: str, types: bytes, starts, ends):
+        """Construye el stream de una vez a partir de códigos de tipo y posiciones ya calculados."""
+        stream = cls.__new__(cls)
+        stream.source = source
+        stream.types = array("B", types)
+        stream.starts = array("I", starts)
+        stream.ends = array("I", ends)
+        return stream
+
+    def __reduce__(self):
+        # Para enviarlo entre procesos: los arreglos viajan como bytes
+        return (_restore_stream, (self.source, self.types.tobytes(), self.starts.tobytes(), self.ends.tobytes()))
+
+    def append(self, token_type, start: int, end: int):
+        self.types.append(self.CODES[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def kind(self, i: int):
+        return self.TYPES[self.types[i]]
+
+    def kinds(self):
+        """Lista de TokenType, sin materializar ningún valor."""
+        types = self.TYPES
+        return [types[code] for code in self.types]
+
+    def value(self, i: int) -> str:
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def to_list(self):
+        source, types = self.source, self.TYPES
+        return [
+            (types[code], source[start:end])
+            for code, start, end in zip(self.types, self.starts, self.ends)
+        ]
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.to_list()[i]
+        return (self.TYPES[self.types[i]], self.source[self.starts[i]:self.ends[i]])
+
+    def __iter__(self):
+        source, types = self.source, self.TYPES
+        for code, start, end in zip(self.types, self.starts, self.ends):
+            yield (types[code], source[start:end])
+
+    def __eq__(self, other):
+        if isinstance(other, TokenStream):
+            other = other.to_list()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TokenStream({self.to_list()!r})"
+
+
+def _restore_stream(source, types, starts, ends):
+    stream = TokenStream.__new__(TokenStream)
+    stream.source = source
+    stream.types = array("B", types)
+    stream.starts = array("I")
+    stream.starts.frombytes(starts)
+    stream.ends = array("I")
+    stream.ends.frombytes(ends)
+    return stream
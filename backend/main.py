@@ -1,10 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routes import router
+from database.storage import get_storage
+from utils.executor import Overloaded, cpu_executor, io_executor
+from utils.parallel import shutdown_pool
+from utils.warmup import warm_up
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Antes de aceptar conexiones: base de datos conectada, índices creados y los
+    # caminos del análisis ya ejecutados una vez (ver utils/warmup.py)
+    warm_up()
+    yield
+    # Con DB_WRITE_BEHIND activo, escribe lo que quede en la cola antes de salir
+    get_storage().shutdown()
+    shutdown_pool()
+    cpu_executor.shutdown()
+    io_executor.shutdown()
 
 app = FastAPI(
     title="JWT Analyzer API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS para permitir peticiones del frontend
@@ -17,3 +37,12 @@ app.add_middleware(
 )
 
 app.include_router(router)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # Rechazo inmediato cuando el ejecutor está lleno: el cliente reintenta más tarde
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
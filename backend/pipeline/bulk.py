@@ -0,0 +1,159 @@
+"""
+Front end por lotes para análisis de muchos tokens (repositorio completo).
+
+Empaqueta todos los tokens en un único buffer de bytes de NumPy y hace con
+operaciones vectorizadas lo que EncodedLexer y JWTDecoder hacen token a token:
+verificación de Σ₁, conteo de '.', separación de segmentos y decodificación
+Base64URL del header y del payload.
+
+Solo se resuelve aquí lo que con certeza pasaría esas dos fases; cualquier token
+dudoso (caracteres fuera de Σ₁, cantidad de '.' distinta de 2, longitud
+imposible en Base64, bytes que no son UTF-8, etc.) se devuelve como None para que
+siga el camino por token y obtenga exactamente el mismo error de siempre.
+Si NumPy no está instalado, todos los tokens siguen el camino por token.
+"""
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+from lexer.tokens import TokenType, TokenStream
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Debajo de este tamaño de lote no compensa armar los buffers
+BULK_MIN_TOKENS = int(os.getenv("BULK_MIN_TOKENS", "64"))
+
+Decoded = Tuple[Union[TokenStream, Sequence[Tuple[TokenType, str]]], str, str]
+
+# Códigos de tipo de los tres segmentos del JWT codificado, en orden
+_ENCODED_TYPES = bytes(
+    TokenStream.CODES[t]
+    for t in (TokenType.HEADER_TOKEN, TokenType.PAYLOAD_TOKEN, TokenType.SIGNATURE_TOKEN)
+)
+
+# Tabla para bytes.translate: byte -> valor de 6 bits del alfabeto Base64URL,
+# o 255 si no pertenece a Σ₁
+_SEXTET = bytearray(b"\xff" * 256)
+for _value, _char in enumerate(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"):
+    _SEXTET[_char] = _value
+_SEXTET = bytes(_SEXTET)
+_DOT = ord(".")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _segment_bytes(sextets, starts, lengths):
+    """
+    Decodifica en bloque segmentos Base64URL sin relleno. Retorna los bytes de
+    todos los segmentos concatenados y el desplazamiento de cada uno en ellos.
+    Los bytes que se usan de un grupo incompleto solo dependen de caracteres del
+    propio segmento, así que lo que haya después (un '.', otro token) no importa;
+    como base64.urlsafe_b64decode, se descartan los bits sobrantes del último carácter.
+    """
+    groups = (lengths + 3) // 4
+    first_group = np.zeros(len(groups), dtype=np.int64)
+    np.cumsum(groups[:-1], out=first_group[1:])
+
+    # Posición del primer carácter de cada grupo: el grupo j de un segmento empieza en start + 4j
+    at = np.arange(int(groups.sum()), dtype=np.int64) * 4
+    at += np.repeat(starts - first_group * 4, groups)
+
+    c0, c1, c2, c3 = sextets[at], sextets[at + 1], sextets[at + 2], sextets[at + 3]
+    out = np.empty((len(at), 3), dtype=np.uint8)
+    out[:, 0] = (c0 << 2) | (c1 >> 4)
+    out[:, 1] = (c1 << 4) | (c2 >> 2)
+    out[:, 2] = (c2 << 6) | c3
+
+    return out.tobytes(), first_group * 3
+
+
+def bulk_decode(tokens: List[str], spans: bool = False) -> List[Optional[Decoded]]:
+    """
+    Para cada token retorna (encoded_tokens, header_json, payload_json) si pasa
+    con certeza el lexer de Σ₁ y la decodificación, o None si debe analizarse
+    por el camino normal. encoded_tokens es una lista como la de EncodedLexer, o
+    un TokenStream con `spans`.
+    """
+    results: List[Optional[Decoded]] = [None] * len(tokens)
+    if np is None or not tokens:
+        return results
+
+    stripped = [t.strip() for t in tokens]
+    # Un carácter no ASCII queda como '?', que no pertenece a Σ₁: cada token conserva su longitud
+    raw = "".join(stripped).encode("ascii", "replace")
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    # Relleno final para que los grupos incompletos del último segmento no se salgan del buffer
+    sextets = np.frombuffer(raw.translate(_SEXTET) + b"\0\0\0", dtype=np.uint8)
+    lengths = np.fromiter(map(len, stripped), dtype=np.int64, count=len(stripped))
+    starts = np.zeros(len(stripped), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    # Los '.' y los caracteres fuera de Σ₁ son pocos: se ubican por posición
+    # y se atribuyen a su token con searchsorted, sin recorrer cada token
+    outside = np.flatnonzero(sextets == 255)
+    is_dot = buf[outside] == _DOT
+    owner = np.searchsorted(starts, outside, side="right") - 1
+    dots = np.bincount(owner[is_dot], minlength=len(stripped))
+    bad = np.bincount(owner[~is_dot], minlength=len(stripped))
+
+    candidates = np.flatnonzero((lengths > 0) & (bad == 0) & (dots == 2))
+    if not len(candidates):
+        return results
+
+    # Posiciones de los dos '.' de cada candidato (relativas al token)
+    dot_positions = outside[is_dot]
+    dots_before = np.zeros(len(stripped), dtype=np.int64)
+    np.cumsum(dots[:-1], out=dots_before[1:])
+    cand_starts = starts[candidates]
+    first_dot = dot_positions[dots_before[candidates]] - cand_starts
+    second_dot = dot_positions[dots_before[candidates] + 1] - cand_starts
+    cand_lengths = lengths[candidates]
+
+    header_len = first_dot
+    payload_len = second_dot - first_dot - 1
+    signature_len = cand_lengths - second_dot - 1
+
+    # Segmentos vacíos no pasan Σ₁; una longitud ≡ 1 (mod 4) nunca es Base64 válido
+    ok = (
+        (header_len > 0) & (payload_len > 0) & (signature_len > 0)
+        & (header_len % 4 != 1) & (payload_len % 4 != 1)
+    )
+    candidates = candidates[ok]
+    if not len(candidates):
+        return results
+    cand_starts = cand_starts[ok]
+    first_dot, second_dot = first_dot[ok], second_dot[ok]
+    header_len, payload_len = header_len[ok], payload_len[ok]
+
+    header_bytes, header_at = _segment_bytes(sextets, cand_starts, header_len)
+    payload_bytes, payload_at = _segment_bytes(sextets, cand_starts + first_dot + 1, payload_len)
+    header_end = header_at + header_len * 3 // 4
+    payload_end = payload_at + payload_len * 3 // 4
+
+    rows = zip(
+        candidates.tolist(), first_dot.tolist(), second_dot.tolist(),
+        header_at.tolist(), header_end.tolist(), payload_at.tolist(), payload_end.tolist(),
+    )
+    for index, d1, d2, h0, h1, p0, p1 in rows:
+        try:
+            header_json = header_bytes[h0:h1].decode("utf-8")
+            payload_json = payload_bytes[p0:p1].decode("utf-8")
+        except UnicodeDecodeError:
+            continue
+
+        token = stripped[index]
+        if spans:
+            encoded = TokenStream.from_spans(token, _ENCODED_TYPES, (0, d1 + 1, d2 + 1), (d1, d2, len(token)))
+        else:
+            encoded = [
+                (TokenType.HEADER_TOKEN, token[:d1]),
+                (TokenType.PAYLOAD_TOKEN, token[d1 + 1:d2]),
+                (TokenType.SIGNATURE_TOKEN, token[d2 + 1:]),
+            ]
+        results[index] = (encoded, header_json, payload_json)
+
+    return results
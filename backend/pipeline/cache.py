@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils.hashing import token_hash
+
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+HEADER_CACHE_SIZE = int(os.getenv("HEADER_CACHE_SIZE", "256"))
+
+
+def verdict_deadline(payload: Optional[Dict[str, Any]], now: float) -> Optional[float]:
+    """
+    Instante a partir del cual SemanticAnalyzer.checkTimeConsistency podría
+    decidir distinto para este payload, o None si el veredicto no depende del reloj.
+    """
+    if not isinstance(payload, dict):
+        return None
+
+    current = int(now)
+    deadline = None
+
+    exp = payload.get("exp")
+    if isinstance(exp, int) and exp >= current:
+        deadline = exp + 1
+
+    nbf = payload.get("nbf")
+    if isinstance(nbf, int) and nbf > current:
+        deadline = nbf if deadline is None else min(deadline, nbf)
+
+    return deadline
+
+
+class VerdictCache:
+    """
+    Caché LRU acotada de resultados de analyzeJWT, indexada por el hash del token.
+    Cada entrada vence al cumplirse el TTL o antes, si el exp/nbf del payload
+    cambiaría el veredicto de checkTimeConsistency.
+    """
+
+    def __init__(self, maxsize: int = VERDICT_CACHE_SIZE, ttl: float = VERDICT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if self.maxsize <= 0:
+            return None
+
+        key = token_hash(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, result = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, token: str, result: Dict[str, Any], payload: Optional[Dict[str, Any]] = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl
+        deadline = verdict_deadline(payload, now)
+        if deadline is not None:
+            expires_at = min(expires_at, deadline)
+        if expires_at <= now:
+            return
+
+        key = token_hash(token)
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class HeaderCache:
+    """
+    Caché LRU acotada de headers ya analizados, indexada por el segmento
+    Base64URL tal como viene en el token. Solo guarda headers que pasaron la
+    decodificación, el léxico, el sintáctico y las reglas E1-E3; cada entrada es
+    (header_json, header_tokens, header) y no vence, porque nada de eso depende
+    del payload ni del reloj.
+    """
+
+    def __init__(self, maxsize: int = HEADER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, segment: str) -> Optional[Tuple[str, Any, Dict[str, Any]]]:
+        if self.maxsize <= 0:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(segment)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(segment)
+            self.hits += 1
+            return entry
+
+    def put(self, segment: str, header_json: str, header_tokens, header: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[segment] = (header_json, header_tokens, header)
+            self._entries.move_to_end(segment)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+verdict_cache = VerdictCache()
+header_cache = HeaderCache()
@@ -0,0 +1,215 @@
+import json
+import os
+from time import perf_counter
+
+from lexer.lexerEncode import EncodedLexer
+from lexer.lexerDecode import LexerDecoded
+from sintactic.parser import SyntaxAnalyzer
+from semantic.semantic import SemanticAnalyzer
+from pipeline.cache import header_cache
+from pipeline.prefilter import PHASE as PREFILTER_PHASE, prefilter as token_prefilter
+from utils.decode import JWTDecoder
+from utils.metrics import PHASE_DURATION, PHASE_ERRORS
+
+# Versión de las reglas del analizador. Cambiarla al modificar una fase hace que
+# el análisis incremental del repositorio vuelva a evaluar los veredictos guardados.
+ANALYZER_VERSION = "1"
+
+# TOKEN_SPANS=1 guarda los tokens léxicos como TokenStream (lexer.tokens) en vez
+# de listas de tuplas: ocupan menos en la caché de veredictos y al pasar entre
+# procesos, pero el análisis léxico es más lento
+TOKEN_SPANS = os.getenv("TOKEN_SPANS", "0") == "1"
+
+
+class PipelineError(Exception):
+    """Error producido en una fase del análisis. Conserva el nombre de la fase."""
+
+    def __init__(self, phase: str, message: str):
+        super().__init__(message)
+        self.phase = phase
+        self.message = message
+
+    def to_dict(self):
+        return {
+            "status": "error",
+            "phase": self.phase,
+            "message": self.message
+        }
+
+
+class JWTPipeline:
+    """
+    Ejecuta todas las fases del análisis de un JWT en una sola pasada:
+    separa y decodifica cada segmento una vez, tokeniza cada JSON una vez, el
+    parser solo valida y json.loads construye el header y el payload.
+    Si el segmento del header ya está en la caché de headers, se omiten su
+    decodificación, léxico, parseo y reglas E1-E3.
+    Los nombres de fase y los mensajes de error son los mismos del análisis por fases.
+    """
+
+    def __init__(self, token: str, spans: bool = TOKEN_SPANS):
+        self.token = token
+        self.spans = spans
+        self.encoded_tokens = []
+        self.header_json = ""
+        self.payload_json = ""
+        self.signature = ""
+        self.header_tokens = []
+        self.payload_tokens = []
+        self.header = None
+        self.payload = None
+        # kid de la clave que verificó la firma (solo con la fase de verificación)
+        self.kid = None
+        # (header_json, header_tokens, header) de la caché de headers, o None
+        self._header_entry = None
+        # Duraciones (segundos, (fase, estado)) aún no registradas en PHASE_DURATION
+        self._timings = []
+
+    def _steps(self, *steps):
+        """
+        Ejecuta las fases (nombre, método) en orden: mide cada una y convierte
+        su excepción en PipelineError con el nombre de la fase.
+        """
+        timings = self._timings
+        start = perf_counter()
+        for phase, step in steps:
+            try:
+                step()
+            except Exception as e:
+                timings.append((perf_counter() - start, (phase, "error")))
+                PHASE_ERRORS.inc(phase)
+                raise PipelineError(phase, str(e)) from e
+            now = perf_counter()
+            timings.append((now - start, (phase, "ok")))
+            start = now
+
+    def _record_timings(self):
+        # Todas las fases de una corrida con una sola toma del lock del histograma
+        PHASE_DURATION.observe_many(self._timings)
+        self._timings = []
+
+    def prefilter(self):
+        """
+        Límites de tamaño y forma antes de cualquier otra fase (pipeline.prefilter).
+        La duración se registra como prefiltro; el error, con la fase que reporta.
+        Sin ningún límite configurado no hace nada.
+        """
+        if not token_prefilter.active:
+            return
+        start = perf_counter()
+        rejection = token_prefilter.check(self.token)
+        if rejection is None:
+            PHASE_DURATION.observe(perf_counter() - start, PREFILTER_PHASE, "ok")
+            return
+        phase, message = rejection
+        PHASE_DURATION.observe(perf_counter() - start, PREFILTER_PHASE, "error")
+        PHASE_ERRORS.inc(phase)
+        raise PipelineError(phase, message)
+
+    # Fases: cada una lanza la excepción de su analizador; _steps le pone el nombre
+
+    def lex_encoded(self):
+        self.encoded_tokens = EncodedLexer(self.token, self.spans).tokenize()
+
+    def lookup_header(self):
+        self._header_entry = header_cache.get(self.encoded_tokens[0][1])
+
+    def decode(self):
+        encoded = self.encoded_tokens
+        self.signature = encoded[2][1]
+        decoder = JWTDecoder(self.token)
+        if self._header_entry is not None:
+            self.header_json = self._header_entry[0]
+        else:
+            self.header_json = decoder.decode_segment(encoded[0][1])
+        self.payload_json = decoder.decode_segment(encoded[1][1])
+
+    def lex_header(self):
+        self.header_tokens = LexerDecoded(self.header_json, self.spans).analyze()
+
+    def lex_payload(self):
+        self.payload_tokens = LexerDecoded(self.payload_json, self.spans).analyze()
+
+    def parse(self):
+        SyntaxAnalyzer(
+            encoded_tokens=self.encoded_tokens,
+            header_tokens=self.header_tokens,
+            payload_tokens=self.payload_tokens,
+            header_checked=self._header_entry is not None
+        ).analyze()
+
+    def build_objects(self):
+        # Con un acierto de la caché de headers el header ya está construido
+        if self._header_entry is not None:
+            self.header = self._header_entry[2]
+        else:
+            self.header = json.loads(self.header_json)
+        self.payload = json.loads(self.payload_json)
+
+    def check_semantics(self):
+        cached = self._header_entry is not None
+        sem = SemanticAnalyzer(self.header, self.payload, self.signature, header_checked=cached)
+        try:
+            sem.analyze()
+        finally:
+            # El header pasó todas sus fases aunque el payload falle después
+            if not cached and sem.header_checked:
+                header_cache.put(self.encoded_tokens[0][1], self.header_json, self.header_tokens, self.header)
+
+    def verify_signature(self, verifier):
+        """
+        Fase opcional, después de run(): la firma debe corresponder a
+        header.payload con alguna de las claves de `verifier`
+        (utils.verify.SignatureVerifier). Solo usa token, header y signature, así
+        que también sirve para un resultado que salió de la caché de veredictos.
+        """
+        unsigned = self.token.strip().rpartition(".")[0]
+
+        def verify():
+            self.kid = verifier.verify(self.header, unsigned, self.signature)
+
+        try:
+            self._steps(("verification", verify))
+        finally:
+            self._record_timings()
+
+    def run(self, prefilter: bool = True):
+        """Todas las fases; `prefilter=False` si el llamador ya aplicó el prefiltro."""
+        try:
+            if prefilter:
+                self.prefilter()
+            self._steps(("lexico-codificado", self.lex_encoded))
+            self.lookup_header()
+            return self._run_decoded(("decode", self.decode))
+        finally:
+            self._record_timings()
+
+    def run_decoded(self, encoded_tokens, header_json: str, payload_json: str):
+        """
+        Ejecuta las fases restantes para un token cuyo prefiltro, análisis léxico
+        de Σ₁ y decodificación ya se hicieron por fuera (p. ej. en pipeline.bulk).
+        """
+        self.encoded_tokens = encoded_tokens
+        self.signature = encoded_tokens[2][1]
+        self.header_json = header_json
+        self.payload_json = payload_json
+        self.lookup_header()
+        try:
+            return self._run_decoded()
+        finally:
+            self._record_timings()
+
+    def _run_decoded(self, *steps):
+        # Con un acierto de la caché de headers se omiten el léxico y el parseo del header
+        if self._header_entry is None:
+            steps += (("lexico-header", self.lex_header),)
+        else:
+            self.header_tokens = self._header_entry[1]
+        self._steps(
+            *steps,
+            ("lexico-payload", self.lex_payload),
+            ("sintactico", self.parse),
+            ("json-parser", self.build_objects),
+            ("semantic", self.check_semantics),
+        )
+        return self
@@ -0,0 +1,85 @@
+"""
+Prefiltro barato que corre antes del pipeline.
+
+Descarta en tiempo constante (o acotado por los límites) los tokens que de todos
+modos serían rechazados o que son demasiado grandes para analizarlos, sin pasar
+por la expresión regular de Σ₁ ni la decodificación Base64URL. Solo mira
+longitudes y la posición de los '.'.
+"""
+import os
+from typing import Optional, Tuple
+
+# Longitud máxima del token completo y de cada segmento, y tamaño máximo del
+# payload una vez decodificado en bytes. 0 = sin límite. Los valores por defecto
+# (1 MiB de token, 256 KiB de payload) acotan lo que un solo token puede ocupar
+# a un worker y quedan muy por encima de cualquier JWT real
+MAX_TOKEN_LENGTH = int(os.getenv("MAX_TOKEN_LENGTH", str(1024 * 1024)))
+MAX_SEGMENT_LENGTH = int(os.getenv("MAX_SEGMENT_LENGTH", "0"))
+MAX_PAYLOAD_BYTES = int(os.getenv("MAX_PAYLOAD_BYTES", str(256 * 1024)))
+# Exigir que el header empiece con "eyJ" ('{"' en Base64URL). Desactivado por
+# defecto: G2 acepta espacios antes de la primera clave ('{ "alg"' -> "eyAi")
+REQUIRE_HEADER_PREFIX = os.getenv("REQUIRE_HEADER_PREFIX", "0") == "1"
+
+HEADER_PREFIX = "eyJ"
+PHASE = "prefiltro"
+
+
+class TokenPrefilter:
+
+    def __init__(self, max_length=MAX_TOKEN_LENGTH, max_segment=MAX_SEGMENT_LENGTH,
+                 max_payload_bytes=MAX_PAYLOAD_BYTES, require_prefix=REQUIRE_HEADER_PREFIX):
+        self.max_length = max_length
+        self.max_segment = max_segment
+        self.max_payload_bytes = max_payload_bytes
+        self.require_prefix = require_prefix
+        # Sin límites solo quedaría contar los '.', y EncodedLexer da el mismo error
+        self.active = bool(max_length or max_segment or max_payload_bytes or require_prefix)
+
+    def check(self, token) -> Optional[Tuple[str, str]]:
+        """
+        Retorna None si el token puede seguir al pipeline, o (fase, mensaje) si
+        se rechaza. Un token sin la cantidad correcta de '.' se reporta en la fase
+        léxica con el mismo mensaje de EncodedLexer, porque es el error que daría.
+        """
+        if not isinstance(token, str):
+            # Lo que no es texto sigue su camino de siempre
+            return None
+
+        # Antes de recorrer el token: len() no depende de su tamaño
+        if self.max_length and len(token) > self.max_length:
+            return PHASE, f"El JWT excede la longitud máxima ({len(token)} > {self.max_length} caracteres)"
+
+        token = token.strip()
+        first = token.find(".")
+        second = token.find(".", first + 1) if first != -1 else -1
+        if second == -1 or token.find(".", second + 1) != -1:
+            return "lexico-codificado", "El JWT codificado debe tener exactamente 3 secciones separadas por '.'"
+
+        lengths = (
+            ("header", first),
+            ("payload", second - first - 1),
+            ("signature", len(token) - second - 1),
+        )
+        if self.max_segment:
+            for name, length in lengths:
+                if length > self.max_segment:
+                    return PHASE, (
+                        f"El segmento {name} excede la longitud máxima "
+                        f"({length} > {self.max_segment} caracteres)"
+                    )
+
+        if self.require_prefix and not token.startswith(HEADER_PREFIX):
+            return PHASE, f"El header no inicia con '{HEADER_PREFIX}' (se esperaba un objeto JSON '{{\"')"
+
+        # Base64URL sin relleno: cada 4 caracteres son 3 bytes
+        payload_bytes = lengths[1][1] * 3 // 4
+        if self.max_payload_bytes and payload_bytes > self.max_payload_bytes:
+            return PHASE, (
+                f"El payload decodificado excede el tamaño máximo "
+                f"({payload_bytes} > {self.max_payload_bytes} bytes)"
+            )
+
+        return None
+
+
+prefilter = TokenPrefilter()
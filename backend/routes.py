@@ -1,60 +1,276 @@
-from fastapi import APIRouter, HTTPException
-from controllers.analyzeController import analyzeJWT
-from controllers.encodeController import encode_jwt
-from controllers.analyzeController import analyze_repository
-from controllers.analyzeController import analyze_repository_summary
+import json
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from controllers.analyzeController import analyzeJWT, analyze_batch, analysis_record
+from controllers.encodeController import encode_batch, encode_jwt
+from controllers.analyzeController import analyze_repository, analyze_repository_stream
+from controllers.analyzeController import analyze_repository_summary, analyze_repository_incremental, list_analyses
 from controllers.encodeController import get_encoded_tokens, test_encode_repository
-from database.db import DatabaseConnector
+from controllers.verifyController import verify_list
+from database.storage import PAGE_SIZE, get_storage
+from pipeline.cache import header_cache, verdict_cache
+from utils.serialize import DETAIL_LEVELS, FastJSONResponse, to_ndjson_line, with_detail
+from utils.metrics import REGISTRY, gauge_lines
+from utils.executor import cpu_executor, io_executor
+from utils.keystore import key_store
+from utils.verify import SignatureVerifier
+from utils.warmup import readiness, startup_report
 
 router = APIRouter()
 
-def _normalize(data: dict):
-    """Normaliza el diccionario eliminando None y valores inútiles."""
-    return {k: v for k, v in data.items() if v is not None}
+def _runtime_metrics():
+    """Contadores de las cachés, del almacén de claves, de los ejecutores y de la escritura diferida para /metrics."""
+    cache = verdict_cache.stats()
+    lines = []
+    lines += gauge_lines("jwt_verdict_cache_size", "Entradas en la caché de veredictos.", cache["size"])
+    for key in ("hits", "misses", "evictions", "expirations"):
+        lines += gauge_lines(f"jwt_verdict_cache_{key}_total", f"Caché de veredictos: {key}.", cache[key], "counter")
+
+    headers = header_cache.stats()
+    lines += gauge_lines("jwt_header_cache_size", "Entradas en la caché de headers.", headers["size"])
+    for key in ("hits", "misses", "evictions"):
+        lines += gauge_lines(f"jwt_header_cache_{key}_total", f"Caché de headers: {key}.", headers[key], "counter")
+
+    keys = key_store.stats()
+    if keys["enabled"]:
+        lines += gauge_lines("jwt_keystore_keys", "Claves cargadas del almacén de claves.", keys["keys"])
+        for key in ("reloads", "errors"):
+            lines += gauge_lines(f"jwt_keystore_{key}_total", f"Almacén de claves: {key}.", keys[key], "counter")
+
+    for executor in (cpu_executor, io_executor):
+        stats = executor.stats()
+        name = executor.name
+        lines += gauge_lines(f"jwt_executor_{name}_queue_depth", f"Tareas esperando en el ejecutor {name}.", stats["queue_depth"])
+        lines += gauge_lines(f"jwt_executor_{name}_running", f"Tareas en ejecución en el ejecutor {name}.", stats["running"])
+        for key in ("rejected", "completed", "failed"):
+            lines += gauge_lines(f"jwt_executor_{name}_{key}_total", f"Ejecutor {name}: {key}.", stats[key], "counter")
+
+    if "total_ms" in startup_report:
+        lines += gauge_lines("jwt_startup_seconds", "Duración del calentamiento al arrancar.", round(startup_report["total_ms"] / 1000, 6))
+    lines += gauge_lines("jwt_ready", "1 si el proceso está listo para recibir tráfico.", int(startup_report["ready"]))
+
+    writer = get_storage().writer_stats()
+    if writer.get("enabled") and "queue_depth" in writer:
+        lines += gauge_lines("jwt_db_writer_queue_depth", "Documentos en la cola de escritura diferida.", writer["queue_depth"])
+        for key in ("enqueued", "blocked", "dropped", "written", "failed"):
+            lines += gauge_lines(f"jwt_db_writer_{key}_total", f"Escritura diferida: {key}.", writer[key], "counter")
+    return lines
+
+REGISTRY.register_collector(_runtime_metrics)
+
+def _parse_batch_tokens(body: bytes, content_type: str):
+    """
+    Acepta un arreglo JSON de tokens, un objeto {"tokens": [...]} o
+    un cuerpo con un token por línea.
+    """
+    text = body.decode("utf-8", errors="replace")
+
+    if "json" in content_type and "ndjson" not in content_type:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise HTTPException(400, "JSON inválido")
+        if isinstance(data, dict):
+            data = data.get("tokens")
+        if not isinstance(data, list) or not all(isinstance(t, str) for t in data):
+            raise HTTPException(400, "tokens requerido: lista de strings")
+        return [t for t in data if t]
+
+    tokens = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('"'):
+            try:
+                line = json.loads(line)
+            except ValueError:
+                raise HTTPException(400, f"Línea NDJSON inválida: {line[:40]}")
+        if line:
+            tokens.append(line)
+    return tokens
+
+def _parse_encode_items(body: bytes, content_type: str):
+    """Acepta un arreglo JSON de {header, payload, secret}, un objeto {"items": [...]} o NDJSON."""
+    text = body.decode("utf-8", errors="replace")
+
+    if "ndjson" in content_type:
+        items = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise HTTPException(400, f"Línea NDJSON inválida: {line[:40]}")
+        return items
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise HTTPException(400, "JSON inválido")
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise HTTPException(400, "items requerido: lista de {header, payload, secret}")
+    return data
+
+def _check_cursor(cursor):
+    if cursor:
+        try:
+            get_storage().check_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+def _check_detail(detail):
+    if detail not in DETAIL_LEVELS:
+        raise HTTPException(400, f"detail debe ser uno de: {', '.join(DETAIL_LEVELS)}")
+
+def _verifier(data: dict, use_store: bool = False):
+    try:
+        return SignatureVerifier.from_request(data, use_store)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
 @router.post("/api/analyze")
-def analyze(data: dict):
+async def analyze(data: dict, detail: str = "full"):
+    """
+    Con `secret` o `keys` en el cuerpo también se verifica la firma (fase
+    "verification"); con `"verify": true` y sin ellos, contra el almacén de claves.
+    `detail` (full / compact / none) elige cómo salen los tokens léxicos.
+    """
+    _check_detail(detail)
     token = data.get("token")
     if not token:
         raise HTTPException(400, "token requerido")
 
-    result = analyzeJWT(token)
+    verifier = _verifier(data, use_store=data.get("verify") is True)
+    result = await cpu_executor.run(analyzeJWT, token, compact=True, verifier=verifier)
 
-    DatabaseConnector.save_analysis(
-        token,
-        _normalize({
-            "status": result.get("status"),
-            "phase": result.get("phase"),
-            "message": result.get("message"),
-            "header": result.get("header"),        
-            "payload": result.get("payload"),     
-            "signature": result.get("signature"),
-        })
-    )
+    await io_executor.run(get_storage().save_analysis, token, analysis_record(result))
 
-    return result
+    return FastJSONResponse(with_detail(result, detail))
+
+@router.post("/api/analyze/batch")
+async def analyze_batch_route(request: Request, detail: str = "full"):
+    """Analiza muchos tokens en una sola petición y responde en NDJSON, en orden."""
+    _check_detail(detail)
+    tokens = _parse_batch_tokens(await request.body(), request.headers.get("content-type", ""))
+    if not tokens:
+        raise HTTPException(400, "tokens requerido")
+
+    lines = (to_ndjson_line(with_detail(result, detail)) for result in analyze_batch(tokens))
+    return StreamingResponse(cpu_executor.stream(lines), media_type="application/x-ndjson")
+
+
+@router.post("/api/verify/batch")
+async def verify_batch(data: dict):
+    """
+    Verifica la firma de muchos tokens con un mismo `secret` o conjunto de `keys`
+    ({kid: secreto} o JWKS); sin ninguno, el almacén de claves (JWT_KEYS_FILE).
+    Responde pasa/falla por token, resumen y tiempos.
+    """
+    tokens = data.get("tokens")
+    if not isinstance(tokens, list) or not tokens or not all(isinstance(t, str) for t in tokens):
+        raise HTTPException(400, "tokens requerido: lista de strings")
+
+    verifier = _verifier(data, use_store=True)
+    if verifier is None:
+        raise HTTPException(400, "secret o keys requerido (o configurar JWT_KEYS_FILE)")
+
+    return await cpu_executor.run(verify_list, tokens, verifier)
 
 
 @router.post("/api/encode")
-def encode(data: dict):
-    result = encode_jwt(data)
+async def encode(data: dict):
+    result = await cpu_executor.run(encode_jwt, data)
+
+    await io_executor.run(get_storage().save_encoded_token, data, result)
+    return result
+
+@router.post("/api/encode/batch")
+async def encode_batch_route(request: Request):
+    """Genera muchos JWT en una sola petición y responde en NDJSON, en orden."""
+    items = _parse_encode_items(await request.body(), request.headers.get("content-type", ""))
+    if not items:
+        raise HTTPException(400, "items requerido")
 
-    DatabaseConnector.save_encoded_token(data, result)
-    return encode_jwt(data)
+    lines = (to_ndjson_line(result) for result in encode_batch(items))
+    return StreamingResponse(cpu_executor.stream(lines), media_type="application/x-ndjson")
 
 @router.get("/api/get_tests")
-def get_tests():
-    return analyze_repository()
+async def get_tests(stream: bool = False, detail: str = "full"):
+    """
+    Con ?stream=true recorre todo el repositorio y responde en NDJSON a medida que
+    analiza. `detail` como en /api/analyze.
+    """
+    _check_detail(detail)
+    if stream:
+        lines = (to_ndjson_line(with_detail(result, detail)) for result in analyze_repository_stream())
+        return StreamingResponse(cpu_executor.stream(lines), media_type="application/x-ndjson")
+
+    response = await cpu_executor.run(analyze_repository, compact=True)
+    if "results" in response:
+        response["results"] = [with_detail(result, detail) for result in response["results"]]
+    return FastJSONResponse(response)
 
 @router.get("/api/analyze_all")
-def analyze_all():
-    return analyze_repository_summary()
+async def analyze_all(incremental: bool = False):
+    """Con ?incremental=true solo analiza lo nuevo desde la última llamada (ver analyze_repository_incremental)."""
+    if incremental:
+        return await cpu_executor.run(analyze_repository_incremental)
+    return await cpu_executor.run(analyze_repository_summary)
+
+@router.get("/api/cache_stats")
+def cache_stats():
+    """Contadores de la caché de veredictos (aciertos, fallos, desalojos) y, en `header`, los de la caché de headers."""
+    stats = verdict_cache.stats()
+    stats["header"] = header_cache.stats()
+    return stats
+
+@router.get("/api/executor_stats")
+def executor_stats():
+    """Ocupación de los ejecutores de las rutas: en ejecución, en cola y rechazos (503)."""
+    return {"cpu": cpu_executor.stats(), "io": io_executor.stats()}
+
+@router.get("/api/ready")
+async def ready():
+    """200 cuando el calentamiento terminó y MongoDB responde; 503 mientras tanto (sonda de readiness)."""
+    state = await io_executor.run(readiness)
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@router.get("/api/startup_report")
+def startup():
+    """Duración y resultado de cada paso del calentamiento al arrancar (ver utils/warmup.py)."""
+    return startup_report
+
+@router.get("/api/writer_stats")
+def writer_stats():
+    """Estado de la escritura diferida: profundidad de cola, contrapresión y descartes."""
+    return get_storage().writer_stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Latencia y errores por fase, latencia de escritura en MongoDB, caché y cola (formato Prometheus)."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/api/analyses")
+async def analyses(limit: int = PAGE_SIZE, cursor: str = None, token_hash: str = None):
+    """
+    Análisis guardados por páginas, más recientes primero. `next_cursor` de la
+    respuesta se pasa como `cursor` para la página siguiente; `token_hash`
+    restringe a las ocurrencias de un token.
+    """
+    _check_cursor(cursor)
+    return await io_executor.run(list_analyses, limit, cursor, token_hash)
 
 @router.get("/api/get_encoded_tests")
-def get_encoded_tests():
-    return get_encoded_tokens()
+async def get_encoded_tests(limit: int = 1000, cursor: str = None):
+    """Tokens generados por páginas (ver /api/analyses para el uso de `cursor`)."""
+    _check_cursor(cursor)
+    return await io_executor.run(get_encoded_tokens, limit, cursor)
 
 @router.get("/api/test_encode_all")
-def test_encode_all():
+async def test_encode_all():
     """Ejecuta pruebas de encoding para todos los tokens guardados."""
-    return test_encode_repository()
\ No newline at end of file
+    return await cpu_executor.run(test_encode_repository)
\ No newline at end of file
@@ -15,16 +15,20 @@ class SemanticAnalyzer:
     }
 
 
-    def __init__(self, header: dict, payload: dict, signature: str):
+    def __init__(self, header: dict, payload: dict, signature: str, header_checked: bool = False):
         self.header = header
         self.payload = payload
         self.signature = signature
         self.symbol_table = {}
+        # True si el header ya pasó E1-E3 (p. ej. viene de la caché de headers)
+        self.header_checked = header_checked
 
     def analyze(self):
-        self.checkHeaderRequiredFields()
-        self.checkHeaderTyp()
-        self.checkHeaderAlg()
+        if not self.header_checked:
+            self.checkHeaderRequiredFields()
+            self.checkHeaderTyp()
+            self.checkHeaderAlg()
+            self.header_checked = True
         self.checkSignatureRequired()
 
         self.checkClaimTypes()
@@ -1,101 +1,132 @@
-from lexer.tokens import TokenType
+import os
+
+from lexer.tokens import TokenType, TokenStream
+
+PARSER_MAX_DEPTH = int(os.getenv("PARSER_MAX_DEPTH", "32"))
+
+L_BRACE = TokenType.L_BRACE
+R_BRACE = TokenType.R_BRACE
+STRING = TokenType.STRING
+COLON = TokenType.COLON
+COMMA = TokenType.COMMA
+BOOLEAN = TokenType.BOOLEAN
 
 class SyntaxErrorException(Exception):
     pass
 
 
 class SyntaxAnalyzer:
-    
-    def __init__(self, encoded_tokens, header_tokens, payload_tokens):
+    """
+    Parser descendente recursivo para G1 (JWT codificado) y G2 (objetos JSON).
+
+    Solo valida: recorre los tipos de los tokens una vez, objetos anidados
+    incluidos y hasta `max_depth` niveles. Los valores (dicts) los construye
+    json.loads en la fase json-parser.
+    """
+
+    def __init__(self, encoded_tokens, header_tokens, payload_tokens,
+                 max_depth=PARSER_MAX_DEPTH, header_checked=False):
         self.encoded = encoded_tokens
         self.header = header_tokens
         self.payload = payload_tokens
-        
+        self.max_depth = max_depth
+        # Header ya validado (caché de headers): no se vuelve a parsear
+        self.header_checked = header_checked
+
 
     def checkEncoded(self):
         if len(self.encoded) != 3:
             raise SyntaxErrorException("El JWT codificado debe tener exactamente 3 secciones (G1).")
 
         h, p, s = self.encoded
-        
+
         for idx, (token_type, segment) in enumerate(self.encoded):
             if not segment.isalnum() and "-" not in segment and "_" not in segment:
                 raise SyntaxErrorException(f"Segmento no válido para γ* en G1: {segment}")
 
 
+    @staticmethod
+    def _view(tokens):
+        """Tipos de todos los tokens y una función para leer el valor del i-ésimo."""
+        if isinstance(tokens, TokenStream):
+            return tokens.kinds(), tokens.value
+        return [token_type for token_type, _ in tokens], lambda i: tokens[i][1]
+
+
     def parseObject(self, tokens, name):
-        i = 0
-        length = len(tokens)
+        kinds, value = self._view(tokens)
 
-        if tokens[i][0] != TokenType.L_BRACE:
+        if kinds[0] is not L_BRACE:
             raise SyntaxErrorException(f"JSON {name} debe iniciar con '{{' (G2).")
-        
+
+        self._parseObject(kinds, value, 0, name, 1)
+        return True
+
+
+    def _parseObject(self, kinds, value_at, i, name, depth):
+        """
+        Reconoce el objeto que empieza en kinds[i] ('{'). Retorna el índice
+        siguiente a su '}', o len(kinds) si no se cerró. El valor de un token
+        solo se lee para el mensaje de error.
+        """
+        if depth > self.max_depth:
+            raise SyntaxErrorException(
+                f"Profundidad máxima de anidamiento ({self.max_depth}) excedida en {name} (G2)."
+            )
+
+        length = len(kinds)
         i += 1
 
-        if i < length and tokens[i][0] == TokenType.R_BRACE:
-            return True
+        if i < length and kinds[i] is R_BRACE:
+            return i + 1
 
         expecting_key = True
 
         while i < length:
-            tok_type, tok_val = tokens[i]
+            tok_type = kinds[i]
 
             if expecting_key:
-                if tok_type != TokenType.STRING:
+                if tok_type is not STRING:
                     raise SyntaxErrorException(f"Se esperaba STRING como clave en {name} (G2).")
-                
+
                 i += 1
 
-                if tokens[i][0] != TokenType.COLON:
+                if kinds[i] is not COLON:
                     raise SyntaxErrorException(f"Falta ':' después de clave en {name} (G2).")
-                
+
                 i += 1
 
                 expecting_key = False
                 continue
 
-            tok_type, tok_val = tokens[i]
-
-            if tok_type in (TokenType.STRING, TokenType.BOOLEAN):
+            if tok_type is STRING or tok_type is BOOLEAN:
                 i += 1
 
-            elif tok_val.isdigit():
-                i += 1
-
-            elif tok_type == TokenType.L_BRACE:
-                brace_stack = 1
-                j = i + 1
-                while j < length and brace_stack > 0:
-                    if tokens[j][0] == TokenType.L_BRACE:
-                        brace_stack += 1
-                    if tokens[j][0] == TokenType.R_BRACE:
-                        brace_stack -= 1
-                    j += 1
-                i = j
+            elif tok_type is L_BRACE:
+                i = self._parseObject(kinds, value_at, i, name, depth + 1)
 
             else:
-                raise SyntaxErrorException(f"Valor no válido en {name}: {tok_val} (G2).")
+                raise SyntaxErrorException(f"Valor no válido en {name}: {value_at(i)} (G2).")
 
             if i >= length:
                 break
 
-            if tokens[i][0] == TokenType.COMMA:
+            if kinds[i] is COMMA:
                 i += 1
                 expecting_key = True
                 continue
-            
-            if tokens[i][0] == TokenType.R_BRACE:
-                return True
 
-            raise SyntaxErrorException(f"Error de estructura en JSON {name} (G2).")
+            if kinds[i] is R_BRACE:
+                return i + 1
 
-        return True
+            raise SyntaxErrorException(f"Error de estructura en JSON {name} (G2).")
 
+        return length
 
 
     def analyze(self):
         self.checkEncoded()
-        self.parseObject(self.header, "header")
+        if not self.header_checked:
+            self.parseObject(self.header, "header")
         self.parseObject(self.payload, "payload")
         return True
-  
\ No newline at end of file
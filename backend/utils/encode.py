@@ -1,20 +1,62 @@
 import json
 import base64
+import os
+import threading
+
+HEADER_ENCODE_CACHE_SIZE = int(os.getenv("HEADER_ENCODE_CACHE_SIZE", "256"))
 
 def base64url_encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).decode().rstrip("=")
 
+def _freeze(value):
+    """
+    Clave hashable que distingue todo lo que json.dumps distingue: el orden de
+    las claves y el tipo de cada valor (1, 1.0 y True son iguales en Python pero
+    no en JSON). Lanza TypeError si hay algo que no se puede usar como clave.
+    """
+    if isinstance(value, dict):
+        return (dict, tuple(((type(k), k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+    hash(value)
+    return (type(value), value)
+
 class JWTEncoder:
 
+    # Segmento Base64URL de los headers ya codificados (casi siempre son los mismos pocos).
+    # Las lecturas no toman el lock; solo las altas y desalojos (FIFO) lo hacen.
+    _header_segments = {}
+    _header_lock = threading.Lock()
+
     def __init__(self, header_dict: dict, payload_dict: dict):
         self.header = header_dict
         self.payload = payload_dict
 
+    @classmethod
+    def encode_header(cls, header) -> str:
+        try:
+            key = _freeze(header)
+        except TypeError:
+            key = None
+
+        if key is not None:
+            segment = cls._header_segments.get(key)
+            if segment is not None:
+                return segment
+
+        segment = base64url_encode(json.dumps(header, separators=(",", ":")).encode())
+
+        if key is not None and HEADER_ENCODE_CACHE_SIZE > 0:
+            with cls._header_lock:
+                cls._header_segments[key] = segment
+                while len(cls._header_segments) > HEADER_ENCODE_CACHE_SIZE:
+                    del cls._header_segments[next(iter(cls._header_segments))]
+        return segment
+
     def encode(self):
-        header_json = json.dumps(self.header, separators=(",", ":")).encode()
+        header_b64 = self.encode_header(self.header)
         payload_json = json.dumps(self.payload, separators=(",", ":")).encode()
 
-        header_b64 = base64url_encode(header_json)
         payload_b64 = base64url_encode(payload_json)
 
         return f"{header_b64}.{payload_b64}"
@@ -0,0 +1,187 @@
+"""
+Ejecutores acotados para las rutas async.
+
+Las rutas envían el trabajo bloqueante a un pool de hilos de tamaño fijo: el
+pipeline a `cpu_executor` y las escrituras/lecturas de MongoDB a `io_executor`.
+Cada pool admite como mucho workers + queue_size tareas a la vez (semáforo sin
+espera); si están todas ocupadas, run() lanza Overloaded de inmediato y la
+aplicación responde 503 con Retry-After, en vez de acumular peticiones y dejar
+crecer la latencia sin límite.
+
+Las respuestas en streaming (NDJSON) se admiten con stream(): ocupan un lugar
+mientras dura la respuesta y cada paso del generador corre en el mismo pool.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterable
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+CPU_QUEUE_SIZE = int(os.getenv("CPU_QUEUE_SIZE", "64"))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+IO_QUEUE_SIZE = int(os.getenv("IO_QUEUE_SIZE", "256"))
+# Segundos que se sugieren al cliente en Retry-After cuando se rechaza una petición
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+
+class Overloaded(Exception):
+    """El ejecutor no tiene lugar para otra tarea."""
+
+    def __init__(self, name: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(f"Servidor ocupado ({name}): reintente en {retry_after} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _Stream:
+    """Iterador async de BoundedExecutor.stream(); tiene el lugar hasta close()."""
+
+    _done = object()
+
+    def __init__(self, executor: "BoundedExecutor", iterator):
+        self._executor = executor
+        self._iterator = iterator
+        self._future = None
+        self._closed = False
+        # Un cliente que se va no cuenta como falla; una excepción del generador sí
+        self._ok = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        self._future = self._executor._pool.submit(
+            self._executor._step, partial(next, self._iterator, self._done)
+        )
+        try:
+            item = await asyncio.wrap_future(self._future)
+        except Exception:
+            self._ok = False
+            self.close()
+            raise
+        if item is self._done:
+            self.close()
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        # Si el cliente se fue con un paso en curso, se cierra al terminar ese paso
+        if self._future is not None and not self._future.done():
+            self._future.add_done_callback(self._release)
+        else:
+            self._release()
+
+    def _release(self, _=None) -> None:
+        try:
+            getattr(self._iterator, "close", lambda: None)()
+        finally:
+            self._executor._finish(self._ok)
+
+    def __del__(self):
+        # Respuesta cancelada antes de terminar (o de empezar): no pierde el lugar
+        self.close()
+
+
+class BoundedExecutor:
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-exec")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _admit(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(self.name)
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+
+    def _finish(self, ok: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+        # El lugar se libera cuando la tarea termina, aunque el cliente ya se haya ido
+        self._slots.release()
+
+    def _step(self, fn):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _call(self, fn):
+        ok = False
+        try:
+            result = self._step(fn)
+            ok = True
+            return result
+        finally:
+            self._finish(ok)
+
+    async def run(self, fn, *args, **kwargs) -> Any:
+        """Ejecuta fn(*args, **kwargs) en el pool, o lanza Overloaded si no hay lugar."""
+        self._admit()
+        try:
+            future = self._pool.submit(self._call, partial(fn, *args, **kwargs))
+        except Exception:
+            self._finish(False)
+            raise
+        return await asyncio.wrap_future(future)
+
+    def stream(self, items: Iterable) -> AsyncIterator:
+        """
+        Admite una respuesta en streaming: lanza Overloaded de inmediato si no hay
+        lugar (antes de empezar a responder) y retorna un iterador async que avanza
+        `items` en el pool. El lugar se libera cuando el iterador termina o el
+        cliente se va.
+        """
+        self._admit()
+        return _Stream(self, iter(items))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "running": self.running,
+                "queue_depth": self.in_flight - self.running,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+cpu_executor = BoundedExecutor("cpu", CPU_WORKERS, CPU_QUEUE_SIZE)
+io_executor = BoundedExecutor("io", IO_WORKERS, IO_QUEUE_SIZE)
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def token_hash(token: str) -> str:
+    """Huella SHA-256 (hex) de un token, usada como clave de caché y de agrupación."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -0,0 +1,172 @@
+"""
+Almacén local de claves HMAC indexadas por `kid`.
+
+Las claves se leen de un archivo JSON (JWT_KEYS_FILE) con la forma de un JWKS
+({"keys": [{"kty": "oct", "kid": ..., "k": ..., "alg": ...}]}) o de un objeto
+{kid: secreto}. Cada clave queda con su HMAC ya inicializado por algoritmo.
+
+El archivo se revisa como mucho cada JWT_KEYS_CHECK_MS milisegundos; si cambió
+su mtime, un hilo en segundo plano lo vuelve a leer y reemplaza el índice de una
+sola vez. Mientras tanto las peticiones siguen usando el índice anterior, y si el
+archivo nuevo no es válido se conserva el anterior.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+JWT_KEYS_FILE = os.getenv("JWT_KEYS_FILE", "")
+JWT_KEYS_CHECK_MS = int(os.getenv("JWT_KEYS_CHECK_MS", "1000"))
+
+DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+}
+
+
+class KeySet:
+    """
+    Claves por kid con su HMAC pre-inicializado para cada algoritmo admitido
+    (el `alg` de la JWK si lo declara; si no, HS256 y HS384). Inmutable.
+    """
+
+    def __init__(self, secrets: Dict[str, bytes], algs: Optional[Dict[str, str]] = None):
+        algs = algs or {}
+        self._macs = {}
+        for kid, secret in secrets.items():
+            for alg in ([algs[kid]] if kid in algs else DIGESTS):
+                self._macs[(alg, kid)] = hmac.new(secret, digestmod=DIGESTS[alg])
+        self._kids = frozenset(secrets)
+
+    def __contains__(self, kid) -> bool:
+        return isinstance(kid, str) and kid in self._kids
+
+    def __iter__(self):
+        return iter(self._kids)
+
+    def __len__(self) -> int:
+        return len(self._kids)
+
+    def mac(self, alg: str, kid: str):
+        """HMAC inicializado para (alg, kid), o None si la clave no admite ese algoritmo."""
+        return self._macs.get((alg, kid))
+
+
+def _jwk_secret(jwk: dict) -> bytes:
+    if jwk.get("kty") != "oct" or not isinstance(jwk.get("k"), str):
+        raise ValueError("Solo se aceptan claves JWK simétricas (kty 'oct' con 'k')")
+    k = jwk["k"]
+    return base64.urlsafe_b64decode(k + "=" * (-len(k) % 4))
+
+
+def parse_keys(keys) -> KeySet:
+    """
+    Arma un KeySet a partir de un objeto {kid: secreto}, un JWKS {"keys": [...]}
+    o directamente la lista de JWK.
+    """
+    if isinstance(keys, dict) and isinstance(keys.get("keys"), list):
+        keys = keys["keys"]
+
+    if isinstance(keys, list):
+        secrets, algs = {}, {}
+        for jwk in keys:
+            if not isinstance(jwk, dict) or not isinstance(jwk.get("kid"), str):
+                raise ValueError("Cada JWK debe ser un objeto con 'kid'")
+            secrets[jwk["kid"]] = _jwk_secret(jwk)
+            if "alg" in jwk:
+                if jwk["alg"] not in DIGESTS:
+                    raise ValueError(f"Algoritmo no soportado en la JWK '{jwk['kid']}': {jwk['alg']}")
+                algs[jwk["kid"]] = jwk["alg"]
+        return KeySet(secrets, algs)
+
+    if isinstance(keys, dict) and all(isinstance(v, str) for v in keys.values()):
+        return KeySet({kid: secret.encode("utf-8") for kid, secret in keys.items()})
+
+    raise ValueError("keys debe ser {kid: secreto} o un JWKS")
+
+
+class KeyStore:
+    """Índice por kid del archivo de claves, recargado en segundo plano cuando cambia."""
+
+    def __init__(self, path: str = JWT_KEYS_FILE, check_interval: float = JWT_KEYS_CHECK_MS / 1000):
+        self.path = path
+        self.check_interval = check_interval
+        self._keys = KeySet({})
+        self._mtime = None
+        self._checked = 0.0
+        self._loaded = False
+        self._reload_lock = threading.Lock()
+
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def keys(self) -> KeySet:
+        """Índice actual. La primera llamada lee el archivo; las siguientes nunca esperan una recarga."""
+        if not self._loaded:
+            with self._reload_lock:
+                if not self._loaded:
+                    self._reload()
+                    self._loaded = True
+        elif time.monotonic() - self._checked >= self.check_interval:
+            self._schedule_reload()
+        return self._keys
+
+    def _schedule_reload(self) -> None:
+        # Si ya hay una revisión en curso, se sigue con el índice actual
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        self._checked = time.monotonic()
+        try:
+            threading.Thread(target=self._reload_in_background, name="keystore-reload", daemon=True).start()
+        except Exception:
+            self._reload_lock.release()
+            raise
+
+    def _reload_in_background(self) -> None:
+        try:
+            self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self) -> None:
+        """Vuelve a leer el archivo si cambió su mtime. Debe llamarse con _reload_lock tomado."""
+        self._checked = time.monotonic()
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                keys = parse_keys(json.load(f))
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return
+
+        self._keys = keys
+        self._mtime = mtime
+        self.reloads += 1
+        self.last_error = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "keys": len(self._keys),
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+key_store = KeyStore()
@@ -0,0 +1,122 @@
+"""
+Ejecución en un pool de procesos para los análisis por lotes (CPU puro).
+
+map_chunks parte la lista en bloques, los reparte entre los procesos y arma los
+resultados en el orden de entrada. Si la función falla con un bloque, el bloque
+se reintenta elemento por elemento dentro del mismo proceso, de modo que un
+elemento problemático solo afecta su propio resultado. Si un proceso del pool
+muere, los elementos de sus bloques se reportan como error y el pool se recrea.
+
+Con ANALYZE_WORKERS=0 (por defecto) todo corre en el proceso actual con el
+mismo manejo de errores.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "0"))
+PARALLEL_CHUNK_SIZE = int(os.getenv("PARALLEL_CHUNK_SIZE", "250"))
+# Con menos elementos que esto no compensa enviar trabajo a otros procesos
+PARALLEL_MIN_ITEMS = int(os.getenv("PARALLEL_MIN_ITEMS", "500"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class ItemError:
+    """Marca el resultado de un elemento cuya función lanzó una excepción."""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _run_chunk(fn: Callable[[list], list], chunk: list) -> list:
+    try:
+        return fn(chunk)
+    except Exception:
+        pass
+
+    results = []
+    for item in chunk:
+        try:
+            results.extend(fn([item]))
+        except Exception as e:
+            results.append(ItemError(str(e)))
+    return results
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool compartido de ANALYZE_WORKERS procesos, o None si está desactivado."""
+    global _pool
+    if ANALYZE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: el proceso padre tiene hilos (escritura diferida, pool de lotes)
+            # y hacer fork con hilos activos puede dejar locks tomados en el hijo
+            _pool = ProcessPoolExecutor(
+                max_workers=ANALYZE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def map_chunks(fn: Callable[[list], list], items: Sequence[Any],
+               on_error: Callable[[Any, str], Any],
+               executor: Optional[ProcessPoolExecutor] = None,
+               chunk_size: int = PARALLEL_CHUNK_SIZE) -> List[Any]:
+    """
+    Aplica `fn` (lista -> lista de igual longitud, definida a nivel de módulo para
+    poder enviarla a otro proceso) sobre `items` por bloques y retorna los
+    resultados en orden. Los elementos que fallan se reemplazan por
+    on_error(elemento, mensaje). Sin executor se usa el pool compartido, salvo
+    que esté desactivado o haya menos de PARALLEL_MIN_ITEMS elementos: entonces
+    se ejecuta en el proceso actual.
+    """
+    items = list(items)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    pool = executor
+    if pool is None and len(items) >= PARALLEL_MIN_ITEMS:
+        pool = get_pool()
+
+    if pool is None:
+        outputs = [_run_chunk(fn, chunk) for chunk in chunks]
+    else:
+        futures = [pool.submit(_run_chunk, fn, chunk) for chunk in chunks]
+        outputs = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                outputs.append(future.result())
+            except BrokenProcessPool:
+                if executor is None:
+                    _discard_pool(pool)
+                outputs.append([ItemError("El proceso de trabajo terminó inesperadamente")] * len(chunk))
+            except Exception as e:
+                outputs.append([ItemError(str(e))] * len(chunk))
+
+    results = []
+    for chunk, output in zip(chunks, outputs):
+        for item, result in zip(chunk, output):
+            results.append(on_error(item, result.message) if isinstance(result, ItemError) else result)
+    return results
@@ -0,0 +1,85 @@
+import json
+from enum import Enum
+
+from fastapi.responses import Response
+
+from lexer.tokens import TokenStream
+
+# Nivel de detalle de los tokens léxicos en las respuestas del análisis:
+#   full     listas [tipo, valor] (lo de siempre)
+#   compact  por sección, {"types": códigos, "values": valores} (ver compact_tokens)
+#   none     sin el campo "tokens"
+DETAIL_LEVELS = ("full", "compact", "none")
+
+_TYPE_NAMES = tuple(token_type.value for token_type in TokenStream.TYPES)
+# Código de tipo (un byte) -> dígito ASCII: "0" es TYPES[0], "1" TYPES[1], ...
+_CODE_DIGITS = bytes((ord("0") + code) % 256 for code in range(256))
+
+
+def _default(obj):
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, TokenStream):
+        # Mismo JSON que to_list(), pero con el nombre del tipo ya resuelto:
+        # así json no vuelve a _default por cada TokenType
+        source, names = obj.source, _TYPE_NAMES
+        return [
+            (names[code], source[start:end])
+            for code, start, end in zip(obj.types, obj.starts, obj.ends)
+        ]
+    raise TypeError(f"Objeto no serializable: {type(obj).__name__}")
+
+
+def to_json(obj) -> str:
+    """Serializa un resultado del análisis (con TokenType, tuplas y TokenStream) a JSON compacto."""
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def to_ndjson_line(obj) -> str:
+    """Una línea NDJSON terminada en salto de línea."""
+    return to_json(obj) + "\n"
+
+
+def compact_tokens(stream) -> dict:
+    """
+    Forma compacta de una secuencia de tokens: `types` es un string con un dígito
+    por token (su posición en TokenType: 0 HEADER_TOKEN ... 8 BOOLEAN) y `values`
+    la lista de valores, en el mismo orden.
+    """
+    if isinstance(stream, TokenStream):
+        source = stream.source
+        return {
+            "types": stream.types.tobytes().translate(_CODE_DIGITS).decode("ascii"),
+            "values": [source[start:end] for start, end in zip(stream.starts, stream.ends)],
+        }
+    codes = TokenStream.CODES
+    return {
+        "types": "".join(chr(ord("0") + codes[token_type]) for token_type, _ in stream),
+        "values": [value for _, value in stream],
+    }
+
+
+def with_detail(result: dict, detail: str) -> dict:
+    """Copia del resultado con los tokens en el nivel de detalle pedido (el mismo dict si es "full")."""
+    tokens = result.get("tokens")
+    if detail == "full" or tokens is None:
+        return result
+    result = dict(result)
+    if detail == "none":
+        del result["tokens"]
+    else:
+        result["tokens"] = {name: compact_tokens(stream) for name, stream in tokens.items()}
+    return result
+
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON serializada directamente con to_json, sin pasar por
+    jsonable_encoder (que recorre cada tupla y convierte cada TokenType).
+    Solo para resultados del análisis: no sabe serializar datetime.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return to_json(content).encode("utf-8")
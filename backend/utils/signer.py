@@ -1,30 +1,80 @@
 import hmac
 import hashlib
 import base64
+import os
+import threading
+
+from utils.keystore import DIGESTS, key_store
+
+SIGNER_CACHE_SIZE = int(os.getenv("SIGNER_CACHE_SIZE", "256"))
+
+# (alg, sha256(secret)) -> HMAC ya inicializado con la clave; se copia por mensaje.
+# Las lecturas no toman el lock; solo las altas y desalojos (FIFO) lo hacen.
+_keyed = {}
+_keyed_lock = threading.Lock()
 
 
 def base64url_encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).decode().rstrip("=")
 
 
-def _make_signer(digestmod, secret: str):
+def keyed_hmac(alg: str, secret):
+    """
+    Retorna el estado HMAC pre-inicializado para (alg, secret), creándolo una sola
+    vez por par. El secreto puede ser texto o bytes (p. ej. la "k" de una JWK).
+    El registro está acotado a SIGNER_CACHE_SIZE entradas.
+    """
+    digestmod = DIGESTS.get(alg)
+    if digestmod is None:
+        raise ValueError("Algoritmo no soportado")
+
+    secret_bytes = secret if isinstance(secret, bytes) else secret.encode("utf-8")
+    key = (alg, hashlib.sha256(secret_bytes).digest())
+
+    mac = _keyed.get(key)
+    if mac is not None:
+        return mac
+
+    mac = hmac.new(secret_bytes, digestmod=digestmod)
+
+    with _keyed_lock:
+        _keyed[key] = mac
+        while len(_keyed) > SIGNER_CACHE_SIZE:
+            del _keyed[next(iter(_keyed))]
+    return mac
+
+
+def sign_with(mac, unsigned_token: str) -> str:
+    """Firma con un HMAC ya inicializado (keyed_hmac, KeySet.mac) sin modificarlo."""
+    mac = mac.copy()
+    mac.update(unsigned_token.encode("utf-8"))
+    return base64url_encode(mac.digest())
+
+
+def sign_token(alg: str, secret: str, unsigned_token: str) -> str:
+    """Firma `header.payload` con HS256 o HS384 y retorna la firma en Base64URL."""
+    return sign_with(keyed_hmac(alg, secret), unsigned_token)
+
+
+def sign_with_kid(alg: str, kid: str, unsigned_token: str) -> str:
+    """Firma `header.payload` con la clave `kid` del almacén de claves (JWT_KEYS_FILE)."""
+    mac = key_store.keys().mac(alg, kid)
+    if mac is None:
+        raise ValueError(f"No hay clave {alg} para el kid '{kid}' en el almacén de claves")
+    return sign_with(mac, unsigned_token)
+
 
-    secret_bytes = secret.encode("utf-8")
+def _make_signer(alg: str, secret: str):
 
     def _sign(unsigned_token: str) -> str:
-        signature = hmac.new(
-            secret_bytes,
-            msg=unsigned_token.encode("utf-8"),
-            digestmod=digestmod
-        ).digest()
-        return base64url_encode(signature)
+        return sign_token(alg, secret, unsigned_token)
 
     return _sign
 
 
 def signer_hs256(secret: str):
-    return _make_signer(hashlib.sha256, secret)
+    return _make_signer("HS256", secret)
 
 
 def signer_hs384(secret: str):
-    return _make_signer(hashlib.sha384, secret)
+    return _make_signer("HS384", secret)
@@ -1,26 +1,30 @@
 import hmac
-import hashlib
-import base64
+
+from utils.keystore import DIGESTS, KeySet, key_store, parse_keys
+from utils.signer import base64url_encode, keyed_hmac, sign_token
+
+
+def verify_token(alg: str, secret: str, unsigned_token: str, signature_b64: str) -> bool:
+    """
+    Verifica una firma HS256/HS384 reutilizando el HMAC pre-inicializado del secreto.
+    """
+    try:
+        # Calcular la firma esperada
+        expected_signature = sign_token(alg, secret, unsigned_token)
+
+        # Comparar con la firma proporcionada
+        return hmac.compare_digest(expected_signature, signature_b64)
+    except Exception:
+        return False
+
 
 def verify_hs256(secret: str):
     """
     Retorna una función que verifica firmas HMAC-SHA256.
     """
     def verify(unsigned_token: str, signature_b64: str) -> bool:
-        try:
-            # Calcular la firma esperada
-            h = hmac.new(
-                secret.encode('utf-8'),
-                unsigned_token.encode('utf-8'),
-                hashlib.sha256
-            )
-            expected_signature = base64.urlsafe_b64encode(h.digest()).decode('utf-8').rstrip('=')
-            
-            # Comparar con la firma proporcionada
-            return hmac.compare_digest(expected_signature, signature_b64)
-        except Exception:
-            return False
-    
+        return verify_token("HS256", secret, unsigned_token, signature_b64)
+
     return verify
 
 def verify_hs384(secret: str):
@@ -28,18 +32,83 @@ def verify_hs384(secret: str):
     Retorna una función que verifica firmas HMAC-SHA384.
     """
     def verify(unsigned_token: str, signature_b64: str) -> bool:
-        try:
-            # Calcular la firma esperada
-            h = hmac.new(
-                secret.encode('utf-8'),
-                unsigned_token.encode('utf-8'),
-                hashlib.sha384
-            )
-            expected_signature = base64.urlsafe_b64encode(h.digest()).decode('utf-8').rstrip('=')
-            
-            # Comparar con la firma proporcionada
-            return hmac.compare_digest(expected_signature, signature_b64)
-        except Exception:
-            return False
-    
+        return verify_token("HS384", secret, unsigned_token, signature_b64)
+
     return verify
+
+
+class SignatureVerifier:
+    """
+    Verifica firmas HS256/HS384 de muchos tokens contra un secreto y/o un
+    conjunto de claves por kid (utils.keystore.KeySet, con el HMAC de cada clave
+    ya inicializado). El HMAC del secreto se resuelve una sola vez por
+    verificador; en todos los casos se copia para cada token.
+    """
+
+    def __init__(self, secret=None, keys: KeySet = None):
+        if secret is None and not keys:
+            raise ValueError("Se requiere secret o keys para verificar firmas")
+        self.secret = secret
+        self.keys = keys if keys is not None else KeySet({})
+        self._secret_macs = {}
+
+    @classmethod
+    def from_request(cls, data: dict, use_store: bool = False):
+        """
+        Verificador a partir de los campos `secret` y/o `keys` de una petición.
+        Si no trae ninguno y `use_store`, usa el almacén de claves (JWT_KEYS_FILE);
+        si tampoco está configurado, retorna None.
+        """
+        secret = data.get("secret")
+        keys = data.get("keys")
+        if secret is None and keys is None:
+            if use_store and key_store.enabled:
+                return cls(keys=key_store.keys())
+            return None
+        if secret is not None and not isinstance(secret, str):
+            raise ValueError("secret debe ser un string")
+        return cls(secret, parse_keys(keys) if keys is not None else None)
+
+    def _mac(self, alg: str, kid):
+        if kid is not None:
+            return self.keys.mac(alg, kid)
+        mac = self._secret_macs.get(alg)
+        if mac is None:
+            mac = self._secret_macs[alg] = keyed_hmac(alg, self.secret)
+        return mac
+
+    def _candidates(self, kid):
+        """Claves a probar: la del kid si existe; sin kid, todas; el secreto general al final."""
+        if kid in self.keys:
+            return [kid]
+        candidates = list(self.keys) if kid is None else []
+        if self.secret is not None:
+            candidates.append(None)
+        return candidates
+
+    def verify(self, header: dict, unsigned_token: str, signature_b64: str):
+        """
+        Retorna el kid de la clave con la que coincide la firma (None si fue el
+        secreto general). Lanza ValueError si ninguna coincide.
+        """
+        alg = header.get("alg")
+        if alg not in DIGESTS:
+            raise ValueError(f"Algoritmo no soportado para verificar: {alg}")
+
+        kid = header.get("kid")
+        candidates = self._candidates(kid)
+        if not candidates:
+            raise ValueError(f"No hay clave para el kid '{kid}'")
+
+        message = unsigned_token.encode("utf-8")
+        for candidate in candidates:
+            mac = self._mac(alg, candidate)
+            if mac is None:
+                # La clave declara otro algoritmo
+                continue
+            mac = mac.copy()
+            mac.update(message)
+            if hmac.compare_digest(base64url_encode(mac.digest()), signature_b64):
+                return candidate
+
+        raise ValueError(f"La firma no coincide con el contenido del token ({alg})")
@@ -0,0 +1,149 @@
+"""
+Calentamiento al arrancar el proceso.
+
+Antes de que el puerto acepte conexiones (lifespan de FastAPI), se conecta el
+almacenamiento (MongoDB o SQLite, ver database/storage.py) y se verifica con
+ping, se crean los índices y se ejecuta
+una vez cada camino caliente del análisis con un token de muestra: el pipeline
+completo (expresiones de los lexers, caché de headers, series de /metrics), el
+front end por lotes, la firma y verificación HMAC y el almacén de claves. Así
+la primera petición después de un despliegue no paga esos costos.
+
+Cada paso se mide y queda en `startup_report`; un paso que falla no detiene el
+arranque (salvo la base de datos con STARTUP_REQUIRE_DB=1) y queda anotado con su error.
+/api/ready responde 200 solo cuando el calentamiento terminó y la base de datos responde.
+"""
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from controllers.analyzeController import _analyze_tokens
+from database.storage import get_storage
+from pipeline.bulk import BULK_MIN_TOKENS, available as bulk_available, bulk_decode
+from pipeline.engine import JWTPipeline
+from utils.encode import JWTEncoder
+from utils.keystore import DIGESTS, key_store
+from utils.parallel import ANALYZE_WORKERS, get_pool
+from utils.signer import keyed_hmac, sign_token
+from utils.verify import SignatureVerifier
+
+# STARTUP_WARMUP=0 arranca sin calentar (el proceso queda listo de inmediato)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+# Con STARTUP_REQUIRE_DB=1 el proceso no arranca si la base de datos no responde
+STARTUP_REQUIRE_DB = os.getenv("STARTUP_REQUIRE_DB", "0") == "1"
+# Tiempo máximo del ping de /api/ready mientras la base de datos no responde: cada
+# sonda ocupa un lugar de io_executor, así que no debe esperar MONGO_TIMEOUT_MS
+READY_PING_TIMEOUT_MS = int(os.getenv("READY_PING_TIMEOUT_MS", "1500"))
+
+_SAMPLE_SECRET = "warmup"
+
+startup_report: Dict[str, Any] = {"ready": False, "steps": {}}
+
+
+def _sample_token(alg: str = "HS256") -> str:
+    header = {"alg": alg, "typ": "JWT"}
+    payload = {"sub": "warmup", "iat": 1700000000, "exp": 4102444800}
+    unsigned = JWTEncoder(header, payload).encode()
+    return f"{unsigned}.{sign_token(alg, _SAMPLE_SECRET, unsigned)}"
+
+
+def _warm_database() -> None:
+    get_storage().connect()
+
+
+def _warm_pipeline() -> None:
+    # JWTPipeline directo, sin pasar por el controlador: la muestra no entra
+    # a la caché de veredictos (sí a la de headers, que es el header más común)
+    for alg in DIGESTS:
+        JWTPipeline(_sample_token(alg)).run()
+
+
+def _warm_bulk() -> None:
+    if bulk_available():
+        bulk_decode([_sample_token()] * max(BULK_MIN_TOKENS, 1))
+
+
+def _warm_signers() -> None:
+    verifier = SignatureVerifier(_SAMPLE_SECRET)
+    for alg in DIGESTS:
+        keyed_hmac(alg, _SAMPLE_SECRET)
+        header_b64, payload_b64, signature = _sample_token(alg).split(".")
+        verifier.verify({"alg": alg}, f"{header_b64}.{payload_b64}", signature)
+
+
+def _warm_keystore() -> None:
+    key_store.keys()
+    if key_store.last_error:
+        raise ValueError(key_store.last_error)
+
+
+def _warm_writer() -> None:
+    get_storage().get_writer()
+
+
+def _warm_workers() -> None:
+    # Un bloque por proceso: cada uno arranca e importa el pipeline ahora
+    pool = get_pool()
+    if pool is not None:
+        list(pool.map(_analyze_tokens, [[_sample_token()]] * ANALYZE_WORKERS))
+
+
+def _step(name: str, fn: Callable[[], None]) -> bool:
+    start = time.perf_counter()
+    try:
+        fn()
+        entry = {"status": "ok"}
+    except Exception as e:
+        entry = {"status": "error", "error": str(e)}
+    entry["ms"] = round((time.perf_counter() - start) * 1000, 3)
+    startup_report["steps"][name] = entry
+    return entry["status"] == "ok"
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Ejecuta los pasos de calentamiento en orden y retorna el reporte. Lanza
+    RuntimeError si STARTUP_REQUIRE_DB está activo y la base de datos no responde.
+    """
+    start = time.perf_counter()
+    startup_report["started_at"] = datetime.now(timezone.utc).isoformat()
+    startup_report["warmup"] = STARTUP_WARMUP
+
+    db_ok = _step("database", _warm_database)
+    if not db_ok and STARTUP_REQUIRE_DB:
+        raise RuntimeError(f"La base de datos no responde: {startup_report['steps']['database']['error']}")
+
+    if db_ok:
+        _step("indexes", get_storage().ensure_indexes)
+    if STARTUP_WARMUP:
+        _step("pipeline", _warm_pipeline)
+        _step("bulk", _warm_bulk)
+        _step("signers", _warm_signers)
+        _step("keystore", _warm_keystore)
+        _step("writer", _warm_writer)
+        _step("workers", _warm_workers)
+
+    startup_report["db"] = db_ok
+    startup_report["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    startup_report["ready"] = db_ok
+    return startup_report
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Estado para /api/ready. Si la base de datos no respondía al arrancar se vuelve a
+    intentar (y se crean los índices) en cada consulta hasta que responda, con un
+    ping acotado por READY_PING_TIMEOUT_MS.
+    """
+    if "total_ms" not in startup_report:
+        return {"ready": False, "reason": "arrancando"}
+    if not startup_report["db"]:
+        try:
+            get_storage().ping(READY_PING_TIMEOUT_MS)
+            get_storage().ensure_indexes()
+        except Exception as e:
+            return {"ready": False, "reason": f"La base de datos no responde: {e}"}
+        startup_report["db"] = True
+        startup_report["ready"] = True
+    return {"ready": True, "startup_ms": startup_report["total_ms"]}
@@ -0,0 +1,67 @@
+"""
+Respuestas NDJSON por lotes: una línea por elemento, en orden, y un error al
+guardar un bloque marcado en las líneas de ese bloque.
+"""
+from controllers import analyzeController, encodeController
+from controllers.analyzeController import analyze_batch
+from controllers.encodeController import encode_batch
+
+VALID_TOKEN = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
+    ".eyJzdWIiOiIxMjM0NTY3ODkwIiwibmFtZSI6IkpvaG4gRG9lIiwiaWF0IjoxNTE2MjM5MDIyfQ"
+    ".SflKxwRJSMeKKF2QT4fwpMeJf36POk6yJV_adQssw5c"
+)
+ITEM = {"header": {"alg": "HS256", "typ": "JWT"}, "payload": {"sub": "1"}, "secret": "s"}
+
+
+class FailingStorage:
+
+    def __init__(self, fail_on_call):
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+        self.saved = []
+
+    def _save(self, items):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("sin conexión")
+        self.saved.extend(items)
+        return [str(i) for i in range(len(items))]
+
+    save_encoded_tokens = _save
+    save_analyses = _save
+
+
+def test_encode_batch_indexes_every_line(monkeypatch):
+    storage = FailingStorage(fail_on_call=2)
+    monkeypatch.setattr(encodeController, "get_storage", lambda: storage)
+
+    items = [ITEM, {"header": "x"}, ITEM, ITEM, ITEM, {"payload": {}}, ITEM]
+    results = list(encode_batch(items, chunk_size=3))
+
+    assert [r["index"] for r in results] == list(range(len(items)))
+    assert [r["status"] for r in results] == ["ok", "error", "ok", "ok", "ok", "error", "ok"]
+    # Solo el segundo bloque (3..5) falló al guardarse, y solo en sus tokens generados
+    assert [r.get("saved", True) for r in results] == [True, True, True, False, False, True, True]
+    assert results[3]["save_error"] == "No se pudo guardar el token: sin conexión"
+    assert "saved" not in results[5]
+    assert len(storage.saved) == 3
+
+
+def test_encode_batch_without_save(monkeypatch):
+    monkeypatch.setattr(encodeController, "get_storage", lambda: FailingStorage(fail_on_call=1))
+    results = list(encode_batch([ITEM, ITEM], save=False))
+    assert [(r["index"], r["status"], "saved" in r) for r in results] == [(0, "ok", False), (1, "ok", False)]
+
+
+def test_analyze_batch_marks_unsaved_results(monkeypatch):
+    storage = FailingStorage(fail_on_call=1)
+    monkeypatch.setattr(analyzeController, "get_storage", lambda: storage)
+
+    tokens = [VALID_TOKEN, "no-es-un-jwt", VALID_TOKEN, "a.b", VALID_TOKEN]
+    results = list(analyze_batch(tokens, chunk_size=2))
+
+    assert [r["token"] for r in results] == tokens
+    assert [r.get("saved", True) for r in results] == [False, False, True, True, True]
+    assert results[0]["save_error"] == "No se pudo guardar el análisis: sin conexión"
+    assert [token for token, _ in storage.saved] == tokens[2:]
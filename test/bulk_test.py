@@ -0,0 +1,80 @@
+"""
+bulk_decode: los tokens que resuelve deben dar lo mismo que EncodedLexer y
+JWTDecoder, y los dudosos quedan en None para el camino por token. Sin NumPy,
+todos siguen el camino por token con los mismos resultados.
+"""
+import base64
+
+import pytest
+
+from controllers.analyzeController import _analyze_tokens, _execute
+from lexer.lexerEncode import EncodedLexer
+from pipeline import bulk
+from pipeline.bulk import BULK_MIN_TOKENS, bulk_decode
+from utils.decode import JWTDecoder
+
+pytest.importorskip("numpy")
+
+HEADER = '{"alg":"HS256","typ":"JWT"}'
+
+
+def b64(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def token(payload, header=HEADER, signature="c2ln"):
+    return f"{b64(header)}.{b64(payload)}.{signature}"
+
+
+VALID = [
+    token('{"sub":"1"}'),
+    token('{"sub":"12","name":"John Doe","admin":true}'),
+    token('{"sub":"123","o":{"x":"y"}}'),
+    "  " + token('{"sub":"1234"}') + "\n",
+    token('{"sub":"ñandú"}'),
+]
+
+# Cada uno debe quedar para el camino por token
+DOUBTFUL = [
+    "",
+    "sin.puntos",
+    "a.b.c.d",
+    token('{"sub":"1"}') + ".",
+    "." + b64('{"sub":"1"}') + ".c2ln",
+    b64(HEADER) + ".." + "c2ln",
+    b64(HEADER) + "." + b64('{"sub":"1"}') + ".",
+    b64(HEADER) + ".eyJzd.c2ln",
+    b64(HEADER) + "." + b64('{"sub":"1"}') + "=.c2ln",
+    b64(HEADER) + "." + b64('{"sub":"1"}') + ".c2ln ñ",
+    b64(HEADER) + "." + b64(b'{"sub":"\xff"}') + ".c2ln",
+    b64(HEADER) + "." + b64('{"sub":"1"}') + ".c2+ln",
+]
+
+
+def per_token(text):
+    encoded = EncodedLexer(text).tokenize()
+    decoded = JWTDecoder(text).decode()
+    return encoded, decoded["header_json"], decoded["payload_json"]
+
+
+def test_bulk_matches_per_token_decoding():
+    decoded = bulk_decode(VALID + DOUBTFUL)
+    for text, result in zip(VALID, decoded):
+        assert result == per_token(text)
+    assert decoded[len(VALID):] == [None] * len(DOUBTFUL)
+
+    spans = bulk_decode(VALID, spans=True)
+    assert [(encoded.to_list(), h, p) for encoded, h, p in spans] == [per_token(text) for text in VALID]
+
+
+def test_without_numpy_every_token_falls_back(monkeypatch):
+    tokens = (VALID + DOUBTFUL) * (BULK_MIN_TOKENS // len(VALID + DOUBTFUL) + 1)
+    expected = [_execute(text) for text in tokens]
+    assert _analyze_tokens(tokens) == expected
+
+    monkeypatch.setattr(bulk, "np", None)
+    assert not bulk.available()
+    assert bulk_decode(tokens) == [None] * len(tokens)
+    assert _analyze_tokens(tokens) == expected
@@ -0,0 +1,77 @@
+"""VerdictCache: LRU acotada cuyas entradas vencen por TTL o antes, según exp/nbf."""
+from types import SimpleNamespace
+
+from pipeline import cache as cache_module
+from pipeline.cache import VerdictCache, verdict_deadline
+
+NOW = 1_700_000_000
+RESULT = {"status": "ok"}
+
+
+def frozen_clock(monkeypatch):
+    clock = SimpleNamespace(now=float(NOW))
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_verdict_deadline():
+    assert verdict_deadline(None, NOW) is None
+    assert verdict_deadline({"sub": "1"}, NOW) is None
+    # exp se cumple un segundo después (exp < now es el vencimiento)
+    assert verdict_deadline({"exp": NOW + 10}, NOW) == NOW + 11
+    assert verdict_deadline({"exp": NOW}, NOW) == NOW + 1
+    # Ya vencido o ya vigente: el veredicto no vuelve a cambiar
+    assert verdict_deadline({"exp": NOW - 1}, NOW) is None
+    assert verdict_deadline({"nbf": NOW}, NOW) is None
+    assert verdict_deadline({"nbf": NOW + 5, "exp": NOW + 60}, NOW) == NOW + 5
+    assert verdict_deadline({"exp": "mañana"}, NOW) is None
+
+
+def test_ttl(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    cache = VerdictCache(maxsize=10, ttl=30)
+    cache.put("a", RESULT, {"sub": "1"})
+
+    clock.now = NOW + 29.9
+    assert cache.get("a") is RESULT
+    clock.now = NOW + 30
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_exp_and_nbf_bound_the_ttl(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    cache = VerdictCache(maxsize=10, ttl=3600)
+    cache.put("exp", RESULT, {"exp": NOW + 10})
+    cache.put("nbf", {"status": "error"}, {"nbf": NOW + 5})
+
+    clock.now = NOW + 4.9
+    assert cache.get("nbf") == {"status": "error"}
+    clock.now = NOW + 5
+    assert cache.get("nbf") is None
+
+    clock.now = NOW + 10.9
+    assert cache.get("exp") is RESULT
+    clock.now = NOW + 11
+    assert cache.get("exp") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (2, 2, 2, 0)
+
+
+def test_lru_eviction_and_disabled_cache(monkeypatch):
+    frozen_clock(monkeypatch)
+    cache = VerdictCache(maxsize=2, ttl=60)
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    assert cache.get("a") is RESULT
+    cache.put("c", RESULT)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is RESULT and cache.get("c") is RESULT
+    assert cache.stats()["evictions"] == 1
+
+    disabled = VerdictCache(maxsize=0)
+    disabled.put("a", RESULT)
+    assert disabled.get("a") is None
+    assert disabled.stats()["misses"] == 0
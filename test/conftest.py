@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del backend se importan desde su raíz (como en uvicorn y los benchmarks)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
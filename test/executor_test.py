@@ -0,0 +1,142 @@
+"""
+BoundedExecutor: admisión sin espera (Overloaded y 503 con Retry-After) y el
+lugar de una respuesta en streaming, que se libera al terminar, al fallar o
+cuando el cliente se va.
+"""
+import asyncio
+import gc
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import routes
+from utils.executor import BoundedExecutor, Overloaded
+
+
+def test_admission_and_counters():
+    executor = BoundedExecutor("prueba", workers=1, queue_size=1)
+    gate = threading.Event()
+
+    def boom():
+        raise RuntimeError("falla")
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(gate.wait))
+        second = asyncio.ensure_future(executor.run(gate.wait))
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        assert (stats["running"], stats["queue_depth"]) == (1, 1)
+
+        # Sin lugar: se rechaza de inmediato, sin encolar
+        with pytest.raises(Overloaded):
+            await executor.run(lambda: None)
+        with pytest.raises(Overloaded):
+            executor.stream([1])
+
+        gate.set()
+        assert await first is True and await second is True
+        with pytest.raises(RuntimeError):
+            await executor.run(boom)
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert (stats["submitted"], stats["rejected"], stats["completed"], stats["failed"]) == (3, 2, 2, 1)
+    assert (stats["running"], stats["queue_depth"]) == (0, 0)
+    executor.shutdown()
+
+
+def test_overloaded_route_returns_503(monkeypatch):
+    executor = BoundedExecutor("cpu", workers=1, queue_size=0)
+    monkeypatch.setattr(routes, "cpu_executor", executor)
+    held = executor.stream(["ocupado"])
+
+    client = TestClient(main.app)
+    response = client.post("/api/analyze", json={"token": "a.b.c"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["detail"].startswith("Servidor ocupado (cpu)")
+
+    held.close()
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
+
+
+def lines(state):
+    try:
+        for n in range(3):
+            yield n
+    finally:
+        state["closed"] = True
+
+
+def test_stream_releases_its_slot():
+    executor = BoundedExecutor("prueba", workers=1, queue_size=0)
+
+    async def consume(stream, count=None):
+        items = []
+        async for item in stream:
+            items.append(item)
+            if count is not None and len(items) == count:
+                await stream.aclose()
+        return items
+
+    # Completa
+    state = {}
+    assert asyncio.run(consume(executor.stream(lines(state)))) == [0, 1, 2]
+    assert state["closed"] and executor.stats()["completed"] == 1
+
+    # El cliente se va a la mitad: se cierra el generador y no cuenta como falla
+    state = {}
+    assert asyncio.run(consume(executor.stream(lines(state)), count=1)) == [0]
+    assert state["closed"]
+    assert (executor.stats()["completed"], executor.stats()["failed"]) == (2, 0)
+
+    # Respuesta descartada antes de empezar: __del__ libera el lugar
+    state = {}
+    stream = executor.stream(lines(state))
+    del stream
+    gc.collect()
+    assert executor.stats()["completed"] == 3
+
+    # Una excepción del generador sí es una falla
+    def broken():
+        yield 1
+        raise ValueError("roto")
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume(executor.stream(broken())))
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"], stats["running"], stats["queue_depth"]) == (3, 1, 0, 0)
+
+    # El cliente se va con un paso en curso: el lugar se libera cuando ese paso termina
+    gate = threading.Event()
+
+    def slow():
+        gate.wait()
+        yield "tarde"
+
+    async def leave_mid_step():
+        stream = executor.stream(slow())
+        step = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        stream.close()
+        assert executor.stats()["running"] == 1
+        with pytest.raises(Overloaded):
+            executor.stream([])
+        gate.set()
+        await step
+
+    asyncio.run(leave_mid_step())
+    # _release corre en el hilo del pool justo después de terminar el paso
+    for _ in range(100):
+        if executor.stats()["completed"] == 4:
+            break
+        time.sleep(0.01)
+    assert executor.stats()["completed"] == 4
+
+    # Con todo liberado, el único lugar vuelve a estar disponible
+    executor.stream([]).close()
+    executor.shutdown()
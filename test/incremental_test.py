@@ -0,0 +1,119 @@
+"""
+analyze_repository_incremental sobre SQLite: después de cada ronda de
+inserciones su resumen debe ser igual al de analyze_repository_summary, que
+vuelve a analizar todo el repositorio.
+"""
+import time
+from datetime import datetime, timedelta
+
+from controllers import analyzeController
+from controllers.analyzeController import analyze_repository_incremental, analyze_repository_summary
+from controllers.encodeController import encode_jwt
+from database import storage as storage_module
+from database.sqlite import SQLiteStorage
+from utils.hashing import token_hash
+
+HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+def make_token(**claims):
+    return encode_jwt({"header": HEADER, "payload": {"sub": "1", **claims}, "secret": "s"})["jwt"]
+
+
+def insert(storage, tokens, created_at):
+    """Como save_analyses, pero con el created_at dado."""
+    storage._insert("analyses", [
+        {"token": token, "token_hash": token_hash(token), "result": {}, "created_at": created_at}
+        for token in tokens
+    ])
+
+
+def setup_storage(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / "jwt.db"))
+    storage.connect()
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    monkeypatch.setattr(analyzeController, "INCREMENTAL_LAG_MS", 0)
+    return storage
+
+
+def assert_matches_full():
+    incremental = analyze_repository_incremental()
+    assert incremental["status"] == "ok", incremental
+    full = analyze_repository_summary()["summary"]
+    assert incremental["summary"] == full
+    return incremental
+
+
+def test_incremental_summary_matches_full_summary(tmp_path, monkeypatch):
+    storage = setup_storage(tmp_path, monkeypatch)
+    now = int(time.time())
+    valid = make_token(name="a")
+    other = make_token(name="b")
+    expiring = make_token(name="c", exp=now + 1)
+    not_yet = make_token(name="d", nbf=now + 1)
+    malformed = "no.es.jwt"
+
+    start = datetime.now() - timedelta(seconds=10)
+    insert(storage, [valid, valid, malformed, expiring, not_yet], start)
+    first = assert_matches_full()
+    assert first["summary"]["total"] == 5
+    assert first["summary"]["valid"] == 3
+    assert first["incremental"]["new_documents"] == 5
+    assert first["incremental"]["watermark"] == start
+
+    # Un documento guardado después con el mismo created_at que el watermark
+    insert(storage, [other], start)
+    second = assert_matches_full()
+    assert second["incremental"]["new_documents"] == 1
+    assert second["summary"]["total"] == 6
+
+    # Nada nuevo: el resumen no cambia y no se analiza nada
+    assert assert_matches_full() == dict(second, incremental=dict(second["incremental"], new_documents=0, analyzed=0))
+
+    # Ocurrencias nuevas de tokens ya conocidos, en un instante posterior
+    insert(storage, [valid, malformed, expiring], start + timedelta(seconds=1))
+    third = assert_matches_full()
+    assert third["summary"]["total"] == 9
+    assert third["summary"]["distinct"] == 5
+    assert third["incremental"]["analyzed"] == 0
+
+    # expiring vence y not_yet entra en vigencia: se re-evalúan sin documentos nuevos
+    while time.time() < now + 2.05:
+        time.sleep(0.05)
+    fourth = assert_matches_full()
+    assert fourth["incremental"]["new_documents"] == 0
+    assert fourth["incremental"]["rechecked"] == 2
+    # valid x3 + other + not_yet; expiring (x2) y malformed (x2) son inválidos
+    assert (fourth["summary"]["valid"], fourth["summary"]["invalid"]) == (5, 4)
+
+
+def test_incremental_lag(tmp_path, monkeypatch):
+    storage = setup_storage(tmp_path, monkeypatch)
+    monkeypatch.setattr(analyzeController, "INCREMENTAL_LAG_MS", 60000)
+    token = make_token(name="e")
+
+    insert(storage, [token], datetime.now() - timedelta(minutes=5))
+    insert(storage, [token, "no.es.jwt"], datetime.now())
+    # Los documentos de menos de un minuto quedan para la siguiente llamada
+    first = analyze_repository_incremental()
+    assert (first["summary"]["total"], first["summary"]["valid"]) == (1, 1)
+
+    monkeypatch.setattr(analyzeController, "INCREMENTAL_LAG_MS", 0)
+    second = assert_matches_full()
+    assert second["incremental"]["new_documents"] == 2
+    assert (second["summary"]["total"], second["summary"]["duplicates"]) == (3, 1)
+
+
+def test_state_without_watermark_ids(tmp_path, monkeypatch):
+    storage = setup_storage(tmp_path, monkeypatch)
+    start = datetime.now() - timedelta(seconds=10)
+    insert(storage, [make_token(name="f"), make_token(name="g")], start)
+    assert_matches_full()
+
+    # Estado guardado por una versión anterior, sin watermark_ids: no se recuentan
+    # los documentos del instante del watermark
+    state = storage.get_analysis_state(analyzeController.INCREMENTAL_STATE)
+    del state["watermark_ids"]
+    storage.save_analysis_state(analyzeController.INCREMENTAL_STATE, state)
+    insert(storage, [make_token(name="h")], start + timedelta(seconds=1))
+    assert assert_matches_full()["incremental"]["new_documents"] == 1
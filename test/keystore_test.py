@@ -0,0 +1,102 @@
+"""parse_keys (JWKS y {kid: secreto}) y la recarga en segundo plano de KeyStore."""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+import pytest
+
+from utils.keystore import KeyStore, parse_keys
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def digest(mac, message=b"header.payload"):
+    mac = mac.copy()
+    mac.update(message)
+    return mac.digest()
+
+
+def test_parse_flat_map():
+    keys = parse_keys({"k1": "secreto", "k2": "otro"})
+    assert sorted(keys) == ["k1", "k2"] and "k1" in keys and 1 not in keys
+    # Sin alg declarado, la clave admite HS256 y HS384
+    assert digest(keys.mac("HS256", "k1")) == hmac.new(b"secreto", b"header.payload", hashlib.sha256).digest()
+    assert digest(keys.mac("HS384", "k2")) == hmac.new(b"otro", b"header.payload", hashlib.sha384).digest()
+    assert keys.mac("HS256", "k3") is None
+
+
+def test_parse_jwks():
+    jwks = {"keys": [
+        {"kty": "oct", "kid": "a", "k": b64(b"\x00\x01binario"), "alg": "HS384"},
+        {"kty": "oct", "kid": "b", "k": b64(b"clave b")},
+    ]}
+    keys = parse_keys(jwks)
+    assert sorted(keys) == ["a", "b"]
+    assert keys.mac("HS256", "a") is None
+    assert digest(keys.mac("HS384", "a")) == hmac.new(b"\x00\x01binario", b"header.payload", hashlib.sha384).digest()
+    assert keys.mac("HS256", "b") is not None
+    # También la lista de JWK sin el objeto que la envuelve
+    assert sorted(parse_keys(jwks["keys"])) == ["a", "b"]
+
+
+@pytest.mark.parametrize("keys, message", [
+    ({"keys": [{"kty": "RSA", "kid": "a", "n": "x"}]}, "Solo se aceptan claves JWK simétricas"),
+    ({"keys": [{"kty": "oct", "k": "eA"}]}, "Cada JWK debe ser un objeto con 'kid'"),
+    ({"keys": [{"kty": "oct", "kid": "a", "k": "eA", "alg": "RS256"}]}, "Algoritmo no soportado en la JWK 'a'"),
+    ({"k1": 123}, "keys debe ser"),
+    ("secreto", "keys debe ser"),
+])
+def test_parse_errors(keys, message):
+    with pytest.raises(ValueError, match=message):
+        parse_keys(keys)
+
+
+def write(path, data, mtime_ns):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "la recarga no terminó a tiempo"
+        time.sleep(0.01)
+
+
+def test_hot_reload(tmp_path):
+    path = tmp_path / "keys.json"
+    base = time.time_ns()
+    write(path, {"k1": "uno"}, base)
+
+    store = KeyStore(str(path), check_interval=0)
+    assert sorted(store.keys()) == ["k1"]
+    assert store.stats()["reloads"] == 1
+
+    # Mismo mtime: no se vuelve a leer aunque el contenido cambie
+    write(path, {"k9": "nueve"}, base)
+    store.keys()
+    wait_for(lambda: not store._reload_lock.locked())
+    assert store.reloads == 1
+    assert sorted(store.keys()) == ["k1"]
+
+    write(path, {"k1": "uno", "k2": "dos"}, base + 10**9)
+    wait_for(lambda: store.keys() is not None and store.reloads == 2)
+    assert sorted(store.keys()) == ["k1", "k2"]
+
+    # Un archivo inválido se cuenta como error y se conserva el índice anterior
+    path.write_text("{no es json", encoding="utf-8")
+    os.utime(path, ns=(base + 2 * 10**9,) * 2)
+    wait_for(lambda: store.keys() is not None and store.errors == 1)
+    assert sorted(store.keys()) == ["k1", "k2"]
+    assert store.stats()["last_error"]
+
+
+def test_disabled_store():
+    store = KeyStore("")
+    assert not store.enabled
+    assert len(store.keys()) == 0
@@ -0,0 +1,105 @@
+"""
+El LexerDecoded actual (SCANNER, y SPAN_SCANNER con spans=True) contra el lexer
+anterior carácter por carácter (benchmarks.bench_lexer.LegacyLexerDecoded):
+mismos tokens para las entradas válidas y el mismo mensaje de error para las
+truncadas y las mal formadas.
+"""
+import json
+
+import pytest
+
+from benchmarks.bench_lexer import LegacyLexerDecoded, make_payload
+from lexer.lexerDecode import LexerDecoded
+from lexer.tokens import TokenStream
+
+
+def run(cls, text, **kwargs):
+    try:
+        tokens = cls(text, **kwargs).analyze()
+    except ValueError as e:
+        return "error", str(e)
+    if isinstance(tokens, TokenStream):
+        tokens = tokens.to_list()
+    return "ok", tokens
+
+
+def assert_same(text):
+    expected = run(LegacyLexerDecoded, text)
+    assert run(LexerDecoded, text) == expected, text
+    assert run(LexerDecoded, text, spans=True) == expected, text
+    return expected
+
+
+VALID = [
+    '{}',
+    '{ }',
+    '{"alg":"HS256","typ":"JWT"}',
+    '{ "alg" : "HS256" , "typ" : "JWT" }',
+    '{"sub":"1234567890","name":"John Doe","admin":true,"iat":1516239022}',
+    '{"a":false,"b":true,"c":""}',
+    '{"user":{"id":"7","roles":{"admin":true}},"exp":1700000000}',
+    '{"a":{},"b":{"c":{}}}',
+    '{"word":abc123,"x":truex,"y":falsey}',
+    '"sin cerrar al final',
+    '{"x":"y"}   ',
+    make_payload(0),
+    make_payload(50),
+    # Léxicamente válidos; los rechaza el parser
+    '{"a":null}',
+    '{"a":"x"',
+    '{"a" "b"}',
+    '{"a":"b" "c"}',
+]
+
+MALFORMED = [
+    '{"a":"b-c"}',
+    '{"a":"b_c"}',
+    '{"mail":"a@b"}',
+    '{"a":-1}',
+    '{"a":1_0}',
+    '{"a":"x"@}',
+    '{"a":["x"]}',
+    '{"a":1.5}',
+    '{"a":"é"}',
+    '{"a":"x\ty"}',
+    '{"a":"x"}\n',
+    '{\n"a":"x"}',
+    '{"a":"x"}}]',
+    '{"a":"b"c"}',
+    '{"a":"b"-"c"}',
+    '@',
+    '-',
+    '"a"_',
+]
+
+
+@pytest.mark.parametrize("text", VALID)
+def test_valid_inputs_produce_the_same_tokens(text):
+    status, _ = assert_same(text)
+    assert status == "ok"
+
+
+@pytest.mark.parametrize("text", VALID)
+def test_every_truncation_matches(text):
+    for end in range(len(text)):
+        assert_same(text[:end])
+
+
+@pytest.mark.parametrize("text", MALFORMED)
+def test_malformed_inputs_raise_the_same_error(text):
+    status, message = assert_same(text)
+    assert status == "error", message
+
+
+@pytest.mark.parametrize("bad", ['-', '_', '@', '"', ' ', '[', '.', 'é', '\n'])
+def test_single_character_substitutions_match(bad):
+    text = '{"sub":"John Doe","admin":true,"n":{"iat":1516239022}}'
+    for i in range(len(text)):
+        assert_same(text[:i] + bad + text[i + 1:])
+        assert_same(text[:i] + bad + text[i:])
+
+
+def test_json_dumps_payloads_match():
+    body = {"sub": "1234567890", "flags": {"a": True, "b": False}, "n": 12}
+    for separators in ((",", ":"), (", ", ": ")):
+        assert_same(json.dumps(body, separators=separators))
@@ -0,0 +1,120 @@
+"""
+Parser de G2 (solo validación) y fase json-parser (json.loads): objetos
+anidados, el límite PARSER_MAX_DEPTH y los textos que el parser acepta pero
+json.loads rechaza.
+"""
+import base64
+import json
+
+import pytest
+
+from lexer.lexerDecode import LexerDecoded
+from pipeline.engine import JWTPipeline, PipelineError
+from sintactic.parser import PARSER_MAX_DEPTH, SyntaxAnalyzer, SyntaxErrorException
+
+HEADER = '{"alg":"HS256","typ":"JWT"}'
+ENCODED = [(None, "eyJhbGciOiJIUzI1NiJ9"), (None, "eyJzdWIiOiIxIn0"), (None, "c2ln")]
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def make_token(payload, header=HEADER):
+    return f"{b64(header)}.{b64(payload)}.c2ln"
+
+
+def parse(payload, **kwargs):
+    return SyntaxAnalyzer(
+        encoded_tokens=ENCODED,
+        header_tokens=LexerDecoded(HEADER).analyze(),
+        payload_tokens=LexerDecoded(payload).analyze(),
+        **kwargs
+    ).analyze()
+
+
+def analyze(payload, header=HEADER):
+    """(fase, mensaje) del error, o ("ok", payload construido)."""
+    try:
+        pipeline = JWTPipeline(make_token(payload, header)).run()
+    except PipelineError as e:
+        return e.phase, e.message
+    return "ok", pipeline.payload
+
+
+def nested(depth):
+    """Payload con `depth` niveles de objetos (el propio payload es el nivel 1)."""
+    return '{"sub":"1",' + '"o":{' * (depth - 1) + '"x":true' + '}' * (depth - 1) + '}'
+
+
+@pytest.mark.parametrize("payload", [
+    '{"sub":"1","user":{"id":"7","roles":{"admin":true}}}',
+    '{"sub":"1","a":{},"b":{"c":{}}}',
+    '{ "sub" : "1" , "o" : { "x" : false } }',
+    '{"sub":"1","o":{"a":"x","b":{"c":"y"},"d":true},"exp":9999999999}',
+])
+def test_nested_objects_are_built_by_json_loads(payload):
+    assert parse(payload) is True
+    assert analyze(payload) == ("ok", json.loads(payload))
+
+
+@pytest.mark.parametrize("payload, message", [
+    ('{"sub":"1","o":{"x"}}', "Falta ':' después de clave en payload (G2)."),
+    ('{"sub":"1","o":{true:"x"}}', "Se esperaba STRING como clave en payload (G2)."),
+    ('{"sub":"1","o":{"x":"y" "z"}}', "Error de estructura en JSON payload (G2)."),
+    ('{"sub":"1","o":{"x":{"y":,}}}', "Valor no válido en payload: , (G2)."),
+])
+def test_errors_inside_nested_objects(payload, message):
+    with pytest.raises(SyntaxErrorException) as exc:
+        parse(payload)
+    assert str(exc.value) == message
+    assert analyze(payload) == ("sintactico", message)
+
+
+def test_default_max_depth():
+    assert PARSER_MAX_DEPTH == 32
+
+
+def test_depth_limit():
+    assert parse(nested(PARSER_MAX_DEPTH)) is True
+    assert analyze(nested(PARSER_MAX_DEPTH)) == ("ok", json.loads(nested(PARSER_MAX_DEPTH)))
+
+    message = f"Profundidad máxima de anidamiento ({PARSER_MAX_DEPTH}) excedida en payload (G2)."
+    with pytest.raises(SyntaxErrorException) as exc:
+        parse(nested(PARSER_MAX_DEPTH + 1))
+    assert str(exc.value) == message
+    assert analyze(nested(PARSER_MAX_DEPTH + 1)) == ("sintactico", message)
+
+
+def test_depth_limit_in_header():
+    header = '{"alg":"HS256","typ":"JWT","x":' + '{"o":' * PARSER_MAX_DEPTH + '{}' + '}' * PARSER_MAX_DEPTH + '}'
+    assert analyze('{"sub":"1"}', header) == (
+        "sintactico", f"Profundidad máxima de anidamiento ({PARSER_MAX_DEPTH}) excedida en header (G2)."
+    )
+
+
+def test_max_depth_argument():
+    assert parse(nested(3), max_depth=3) is True
+    with pytest.raises(SyntaxErrorException, match=r"\(2\) excedida en payload"):
+        parse(nested(3), max_depth=2)
+
+
+# Aceptados por el parser de G2 (que solo mira los tipos de token, sin
+# valores ni lo que sigue al objeto), rechazados por json.loads
+@pytest.mark.parametrize("payload, message", [
+    ('{"sub":abc}', "Expecting value: line 1 column 8 (char 7)"),
+    ('{"sub":01}', "Expecting ',' delimiter: line 1 column 9 (char 8)"),
+    ('{"sub":"1"}}', "Extra data: line 1 column 12 (char 11)"),
+    ('{"sub":"1"} {', "Extra data: line 1 column 13 (char 12)"),
+    ('{"sub":"1"', "Expecting ',' delimiter: line 1 column 11 (char 10)"),
+    ('{"sub":"1","o":{"x":"y"}', "Expecting ',' delimiter: line 1 column 25 (char 24)"),
+])
+def test_json_parser_phase_rejects_what_the_grammar_accepts(payload, message):
+    assert parse(payload) is True
+    assert analyze(payload) == ("json-parser", message)
+
+
+def test_numbers_are_built_as_numbers():
+    assert analyze('{"sub":"1","iat":1516239022,"o":{"n":7}}') == (
+        "ok", {"sub": "1", "iat": 1516239022, "o": {"n": 7}}
+    )
@@ -0,0 +1,36 @@
+"""Límites por defecto del prefiltro y su efecto en analyzeJWT."""
+import base64
+
+from controllers.analyzeController import analyzeJWT
+from pipeline.prefilter import MAX_PAYLOAD_BYTES, MAX_TOKEN_LENGTH, TokenPrefilter, prefilter
+
+HEADER = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def test_default_limits_are_on():
+    assert (MAX_TOKEN_LENGTH, MAX_PAYLOAD_BYTES) == (1024 * 1024, 256 * 1024)
+    assert prefilter.active
+    assert not TokenPrefilter(0, 0, 0, False).active
+
+
+def test_large_but_realistic_token_passes():
+    claims = ",".join(f'"claim{n}":"valor {n}"' for n in range(2000))
+    token = f'{HEADER}.{b64("{" + claims + "}")}.c2ln'
+    assert prefilter.check(token) is None
+    assert analyzeJWT(token)["status"] == "ok"
+
+
+def test_oversized_tokens_are_rejected():
+    payload = "A" * (MAX_PAYLOAD_BYTES * 4 // 3 + 8)
+    assert analyzeJWT(f"{HEADER}.{payload}.c2ln")["phase"] == "prefiltro"
+    assert prefilter.check(f"{HEADER}.{payload}.c2ln")[1].startswith("El payload decodificado excede")
+
+    signature = "A" * MAX_TOKEN_LENGTH
+    result = analyzeJWT(f"{HEADER}.e30.{signature}")
+    assert (result["phase"], result["message"]) == (
+        "prefiltro", f"El JWT excede la longitud máxima ({len(HEADER) + 5 + MAX_TOKEN_LENGTH} > {MAX_TOKEN_LENGTH} caracteres)"
+    )
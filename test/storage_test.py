@@ -0,0 +1,132 @@
+"""
+SQLiteStorage sobre un archivo temporal: guardado y consulta de análisis,
+paginación por cursor, filtros con operadores de MongoDB y los veredictos y
+el estado que usa el análisis incremental.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes
+from database import storage as storage_module
+from database.sqlite import SQLiteStorage
+from utils.hashing import token_hash
+
+
+def make_storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "jwt.db"))
+    storage.connect()
+    storage.ensure_indexes()
+    return storage
+
+
+def result(n):
+    return {"status": "ok" if n % 2 else "error", "phase": None if n % 2 else "semantic", "payload": {"n": n}}
+
+
+def test_save_and_find_analyses(tmp_path):
+    storage = make_storage(tmp_path)
+    ids = storage.save_analyses([(f"tok{n}", result(n)) for n in range(3)])
+    assert len(ids) == len(set(ids)) == 3
+
+    docs = storage.find_analyses({}, 10)
+    assert sorted(doc["token"] for doc in docs) == ["tok0", "tok1", "tok2"]
+    doc = next(doc for doc in docs if doc["token"] == "tok1")
+    assert doc["result"] == result(1)
+    assert doc["token_hash"] == token_hash("tok1")
+    assert isinstance(doc["created_at"], datetime)
+
+    # Proyección con campos anidados, como list_analyses
+    projected = storage.find_analyses({"token": "tok2"}, 10, {"token": 1, "result.status": 1})
+    assert projected == [{"_id": projected[0]["_id"], "token": "tok2", "result": {"status": "error"}}]
+    assert storage.find_analyses({"token": {"$in": ["tok0", "tok9"]}}, 10, {"token": 1})[0]["token"] == "tok0"
+
+
+def test_find_page_with_shared_created_at(tmp_path):
+    storage = make_storage(tmp_path)
+    # Cada save_analyses guarda todo el lote con el mismo created_at
+    for batch in range(3):
+        storage.save_analyses([(f"tok{batch}-{n}", result(n)) for n in range(7)])
+        time.sleep(0.002)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        docs, cursor = storage.find_page("analyses", projection={"token": 1}, limit=4, cursor=cursor)
+        seen += docs
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 6
+    ids = [doc["_id"] for doc in seen]
+    assert len(ids) == len(set(ids)) == 21
+    # Más recientes primero; dentro del mismo instante, _id descendente
+    assert [(doc["created_at"], doc["_id"]) for doc in seen] == sorted(
+        ((doc["created_at"], doc["_id"]) for doc in seen), reverse=True
+    )
+
+    hashed, _ = storage.find_page("analyses", {"token_hash": token_hash("tok1-3")}, {"token": 1})
+    assert [doc["token"] for doc in hashed] == ["tok1-3"]
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "e30", "eyJ0IjoiYWJjIiwiaSI6MX0", "eyJ0IjoiMjAyNS0wMS0wMVQwMDowMDowMC4wMDAwMDAiLCJpIjoiMSJ9"])
+def test_bad_cursor(tmp_path, monkeypatch, cursor):
+    storage = make_storage(tmp_path)
+    with pytest.raises(ValueError, match="cursor inválido"):
+        storage.check_cursor(cursor)
+    with pytest.raises(ValueError, match="cursor inválido"):
+        storage.find_page("analyses", cursor=cursor)
+
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    app = FastAPI()
+    app.include_router(routes.router)
+    response = TestClient(app).get("/api/analyses", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "cursor inválido"}
+
+
+def test_iter_analyses_after_created_at(tmp_path):
+    storage = make_storage(tmp_path)
+    storage.save_analyses([("old1", result(1)), ("old2", result(2))])
+    mark = storage.find_analyses({}, 1)[0]["created_at"]
+    time.sleep(0.002)
+    storage.save_analyses([("new1", result(3)), ("new2", result(4)), ("new3", result(5))])
+
+    newer = list(storage.iter_analyses({"created_at": {"$gt": mark}}, 2, {"token": 1}))
+    assert sorted(doc["token"] for doc in newer) == ["new1", "new2", "new3"]
+    assert all(set(doc) == {"_id", "token"} for doc in newer)
+    assert len(list(storage.iter_analyses({"created_at": {"$lte": mark}}, 2))) == 2
+
+
+def test_verdicts_and_analysis_state(tmp_path):
+    storage = make_storage(tmp_path)
+    now = datetime.now().replace(microsecond=0)
+    storage.save_verdicts([
+        {"_id": "h1", "analyzer_version": "1", "status": "ok", "recheck_at": None},
+        {"_id": "h2", "analyzer_version": "1", "status": "ok", "recheck_at": now - timedelta(seconds=1)},
+        {"_id": "h3", "analyzer_version": "1", "status": "error", "recheck_at": now + timedelta(hours=1)},
+        {"_id": "h4", "analyzer_version": "0", "status": "ok", "recheck_at": None},
+    ])
+
+    found = storage.find_verdicts(["h1", "h3", "missing"], chunk_size=2)
+    assert set(found) == {"h1", "h3"}
+    assert found["h3"]["recheck_at"] == now + timedelta(hours=1)
+    assert found["h3"]["status"] == "error"
+
+    # Otra versión del analizador o un recheck_at vencido
+    assert sorted(doc["_id"] for doc in storage.iter_stale_verdicts("1", now)) == ["h2", "h4"]
+
+    # Reemplazar un veredicto lo saca de los vencidos
+    storage.save_verdicts([{"_id": "h2", "analyzer_version": "1", "status": "ok", "recheck_at": None}])
+    assert sorted(doc["_id"] for doc in storage.iter_stale_verdicts("1", now)) == ["h4"]
+
+    assert storage.get_analysis_state("repository") is None
+    state = {"watermark": now, "summary": {"total": 3, "valid": 2}}
+    storage.save_analysis_state("repository", state)
+    storage.save_analysis_state("repository", {**state, "_id": "ignorado", "summary": {"total": 4, "valid": 2}})
+    assert storage.get_analysis_state("repository") == {
+        "_id": "repository", "watermark": now, "summary": {"total": 4, "valid": 2}
+    }
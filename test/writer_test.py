@@ -0,0 +1,80 @@
+"""
+WriteBehindQueue: agrupa por colección, contrapresión con descarte contado
+cuando la cola está llena y vaciado completo al detenerse.
+"""
+import threading
+import time
+
+from database.writer import WriteBehindQueue
+
+
+class Recorder:
+
+    def __init__(self, gate=None, fail=False):
+        self.calls = []
+        self.gate = gate
+        self.fail = fail
+
+    def __call__(self, collection, docs):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            raise RuntimeError("sin conexión")
+        self.calls.append((collection, [doc["n"] for doc in docs]))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_batches_by_collection_and_drains_on_stop():
+    insert = Recorder()
+    writer = WriteBehindQueue(insert, batch_size=3, flush_interval=60, maxsize=100)
+    for n in range(4):
+        assert writer.submit("analyses" if n % 2 else "encoded_tokens", {"n": n})
+
+    # Tres documentos completan un lote aunque el intervalo sea largo
+    wait_for(lambda: writer.stats()["written"] == 3)
+    assert sorted(insert.calls) == [("analyses", [1]), ("encoded_tokens", [0, 2])]
+
+    # El cuarto queda pendiente hasta stop(), que escribe todo antes de terminar
+    writer.submit("analyses", {"n": 4})
+    writer.stop()
+    assert insert.calls[-1] == ("analyses", [3, 4])
+    stats = writer.stats()
+    assert (stats["enqueued"], stats["written"], stats["dropped"], stats["queue_depth"]) == (5, 5, 0, 0)
+    assert not writer._thread.is_alive()
+
+
+def test_backpressure_and_drops():
+    gate = threading.Event()
+    insert = Recorder(gate)
+    writer = WriteBehindQueue(insert, batch_size=1, flush_interval=60, maxsize=2, put_timeout=0.05)
+
+    # El hilo toma el primero y queda bloqueado escribiéndolo; la cola se llena con dos más
+    writer.submit("analyses", {"n": 0})
+    wait_for(lambda: writer.stats()["queue_depth"] == 0)
+    assert writer.submit("analyses", {"n": 1}) and writer.submit("analyses", {"n": 2})
+
+    started = time.perf_counter()
+    assert writer.submit("analyses", {"n": 3}) is False
+    assert time.perf_counter() - started >= 0.05
+    stats = writer.stats()
+    assert (stats["enqueued"], stats["blocked"], stats["dropped"]) == (3, 1, 1)
+
+    gate.set()
+    writer.stop()
+    assert [n for _, docs in insert.calls for n in docs] == [0, 1, 2]
+    assert writer.stats()["written"] == 3
+
+
+def test_failed_flushes_are_counted():
+    writer = WriteBehindQueue(Recorder(fail=True), batch_size=2, flush_interval=60)
+    for n in range(3):
+        writer.submit("analyses", {"n": n})
+    writer.stop()
+    stats = writer.stats()
+    assert (stats["written"], stats["failed"], stats["flushes"]) == (0, 3, 2)